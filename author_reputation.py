@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+from scan_log import get_logger
+
+log = get_logger("author_reputation")
+
+class AuthorReputation:
+    """เก็บประวัติผลตรวจของผู้เขียนแต่ละ channel เพื่อตัดสินเร็วโดยไม่ต้องใช้ pattern/AI
+
+    - ค้นหาด้วย dict (O(1)) และจำกัดจำนวนผู้เขียนแบบ LRU
+    - จำนวนครั้งที่เป็น spam/ไม่ใช่ spam ลดลงตามเวลา (half-life)
+    """
+
+    def __init__(self, db_file="author_reputation.json", max_authors=50000,
+                 half_life_days=30, spam_threshold=2.0, clean_threshold=3.0):
+        """
+        db_file: ไฟล์เก็บข้อมูลถาวร
+        max_authors: จำนวนผู้เขียนสูงสุดที่เก็บในหน่วยความจำ
+        half_life_days: จำนวนวันที่คะแนนลดลงครึ่งหนึ่ง
+        spam_threshold: จำนวน spam ที่ยืนยันแล้วขั้นต่ำก่อนตัดสินเป็น spam ทันที
+        clean_threshold: จำนวนครั้งที่ไม่ใช่ spam ขั้นต่ำก่อนข้าม AI
+        """
+        self.db_file = db_file
+        self.max_authors = max_authors
+        self.half_life = half_life_days * 86400
+        self.spam_threshold = spam_threshold
+        self.clean_threshold = clean_threshold
+        self.authors = OrderedDict()
+        self.stats = {"lookups": 0, "fast_spam": 0, "fast_clean": 0}
+        self.load()
+
+    def load(self):
+        """โหลดข้อมูลจากไฟล์"""
+        try:
+            if os.path.exists(self.db_file):
+                with open(self.db_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # เรียงตามเวลาอัพเดทเพื่อให้ LRU ตัดตัวเก่าสุดออกก่อน
+                for author_id, entry in sorted(data.items(), key=lambda kv: kv[1].get("updated", 0)):
+                    self.authors[author_id] = entry
+                self._evict()
+        except Exception as e:
+            log.warning("reputation_load_failed", f"ไม่สามารถโหลดข้อมูลผู้เขียนได้: {e}", path=self.db_file, error=str(e))
+            self.authors = OrderedDict()
+
+    def save(self):
+        """บันทึกข้อมูลลงไฟล์"""
+        try:
+            with open(self.db_file, 'w', encoding='utf-8') as f:
+                json.dump(self.authors, f, ensure_ascii=False)
+        except Exception as e:
+            log.warning("reputation_save_failed", f"ไม่สามารถบันทึกข้อมูลผู้เขียนได้: {e}", path=self.db_file, error=str(e))
+
+    def _decayed(self, entry, now):
+        """ลดคะแนนตามเวลาที่ผ่านไปตั้งแต่อัพเดทครั้งล่าสุด"""
+        elapsed = now - entry.get("updated", now)
+        if elapsed > 0 and self.half_life > 0:
+            factor = 0.5 ** (elapsed / self.half_life)
+            entry["spam"] *= factor
+            entry["clean"] *= factor
+        entry["updated"] = now
+        return entry
+
+    def _evict(self):
+        while len(self.authors) > self.max_authors:
+            self.authors.popitem(last=False)
+
+    def lookup(self, author_id):
+        """คืนค่า 'spam' / 'clean' / None ตามประวัติของผู้เขียน"""
+        if not author_id:
+            return None
+        self.stats["lookups"] += 1
+        entry = self.authors.get(author_id)
+        if entry is None:
+            return None
+        self.authors.move_to_end(author_id)
+        entry = self._decayed(entry, time.time())
+        # เผื่อค่าคลาดเคลื่อนจากการ decay ในช่วงเวลาสั้นๆ
+        spam = entry["spam"] + 1e-6
+        clean = entry["clean"] + 1e-6
+        if spam >= self.spam_threshold and entry["spam"] > entry["clean"]:
+            self.stats["fast_spam"] += 1
+            return "spam"
+        if clean >= self.clean_threshold and entry["spam"] < 0.5:
+            return "clean"
+        return None
+
+    def is_trusted(self, reputation, pattern_score, max_pattern_score):
+        """ผู้เขียนที่ไม่เคย spam และ pattern score ไม่เกิน max_pattern_score ข้าม AI ได้"""
+        if reputation == "clean" and pattern_score <= max_pattern_score:
+            self.stats["fast_clean"] += 1
+            return True
+        return False
+
+    def record(self, author_id, is_spam):
+        """บันทึกผลตรวจของผู้เขียน (spam ควรมาจากผลที่ AI ยืนยันเท่านั้น)"""
+        if not author_id:
+            return
+        now = time.time()
+        entry = self.authors.get(author_id)
+        if entry is None:
+            entry = {"spam": 0.0, "clean": 0.0, "updated": now}
+            self.authors[author_id] = entry
+        else:
+            self.authors.move_to_end(author_id)
+            self._decayed(entry, now)
+        entry["spam" if is_spam else "clean"] += 1
+        self._evict()
+
+    def get_stats(self):
+        return dict(self.stats, authors=len(self.authors))
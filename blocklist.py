@@ -0,0 +1,193 @@
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from datetime import datetime
+
+from scan_log import get_logger
+
+log = get_logger("blocklist")
+
+# domain ทั่วไปที่พบได้ในความคิดเห็นปกติ ไม่นำเข้า blocklist
+SAFE_DOMAINS = {
+    "youtube.com", "youtu.be", "google.com", "facebook.com", "fb.com",
+    "instagram.com", "tiktok.com", "twitter.com", "x.com", "wikipedia.org",
+    # อีเมล
+    "gmail.com", "hotmail.com", "outlook.com", "live.com", "yahoo.com", "icloud.com",
+    # ลิงก์ย่อ (เก็บเฉพาะ URL เต็ม ไม่บล็อกทั้ง domain)
+    "bit.ly", "t.co", "tinyurl.com", "goo.gl", "cutt.ly", "shorturl.at", "lin.ee", "line.me"
+}
+SHORT_LINK_DOMAINS = {"bit.ly", "t.co", "tinyurl.com", "goo.gl", "cutt.ly", "shorturl.at", "lin.ee", "line.me"}
+
+# x.y จะนับเป็น domain เมื่อมี scheme, www. หรือ path เท่านั้น (ไม่ให้ Mr.Smith, hello.world ตรง)
+URL_PATTERN = re.compile(r'(?i)(?<![a-z0-9@.-])(https?://)?(www\.)?((?:[a-z0-9-]+\.)+[a-z]{2,})(/[^\s]*)?')
+# @handle นับเฉพาะที่ตามหลังคำชวนติดต่อ (@mention ทั่วไปไม่ใช่ identifier ของ spam)
+CONTACT_HANDLE_PATTERN = re.compile(
+    r'(?:(?<![a-z])(?:line|add|contact|dm)(?![a-z])|ไลน์|แอด|ติดต่อ|ทัก)[^@\n]{0,12}?(?<![a-z0-9._])@([a-z0-9._]{3,})')
+# Line ID: group 1-3 คือเครื่องหมายที่บอกว่าตามด้วย ID (id/ไอดี, :, @) group 4 คือ ID
+LINE_PATTERN = re.compile(r'(?:(?<![a-z])line(?![a-z.])|ไลน์)\s*(id(?![a-z])|ไอดี)?\s*(:)?\s*(@)?([a-z0-9._-]{3,})')
+LINE_ID_CHARS = re.compile(r'[0-9._]')
+# คำที่ตามหลัง "line" ในประโยคทั่วไป ("in line now", "line for the win") ไม่ใช่ Line ID
+LINE_STOPWORDS = {
+    "now", "for", "the", "and", "today", "with", "this", "that", "here", "there", "then",
+    "was", "are", "is", "you", "your", "our", "up", "out", "off", "down", "again", "too",
+    "just", "still", "all", "one", "between", "from", "into", "about", "break", "ups"
+}
+LINE_URL_PATTERN = re.compile(r'(?i)line\.me/(?:ti/p/~?|r/ti/p/|R/ti/p/)?@?([a-z0-9._-]{3,})')
+
+def _line_id(match):
+    """คืนค่า Line ID จาก match ของ LINE_PATTERN หรือ None ถ้าน่าจะเป็นคำทั่วไป
+
+    ต้องมีเครื่องหมาย (id/ไอดี, :, @) หรือ ID มีตัวเลข . หรือ _ และต้องไม่ใช่ stopword
+    """
+    id_marker, colon, at, token = match.groups()
+    line_id = token.strip('._-')
+    if not line_id or line_id in LINE_STOPWORDS:
+        return None
+    if id_marker or colon or at or LINE_ID_CHARS.search(line_id):
+        return line_id
+    return None
+
+def extract_identifiers(text, cleaned_text):
+    """ดึง URL, domain, Line ID และ @handle ที่ใช้ติดต่อ (normalize แล้ว) จากความคิดเห็น
+
+    text: ข้อความดิบ (ใช้หา URL เพราะ preprocess_text ตัด / และ : ทิ้ง)
+    cleaned_text: ผลจาก preprocess_text (ใช้หา handle และ Line ID ที่เขียนด้วยอักขระพิเศษ)
+    คืนค่า set ของ identifier แบบ "ประเภท:ค่า"
+    """
+    identifiers = set()
+    normalized = unicodedata.normalize('NFKC', text).lower()
+
+    for match in URL_PATTERN.finditer(normalized):
+        scheme, www, domain, path = match.groups()
+        domain = domain.strip('.')
+        path = (path or "").rstrip('/.,')
+        if not (scheme or www or path):
+            continue
+        if domain in SHORT_LINK_DOMAINS:
+            if path:
+                identifiers.add(f"url:{domain}{path}")
+            continue
+        if domain in SAFE_DOMAINS or '.' not in domain:
+            continue
+        identifiers.add(f"domain:{domain}")
+        if path:
+            identifiers.add(f"url:{domain}{path}")
+
+    for match in LINE_URL_PATTERN.finditer(normalized):
+        identifiers.add(f"line:{match.group(1).strip('._-')}")
+    # preprocess_text ตัดวรรณยุกต์ไทยทิ้ง (ไลน์ -> ไลน) จึงหาคำชวนติดต่อจากข้อความ NFKC ด้วย
+    for source in (normalized, cleaned_text):
+        for match in LINE_PATTERN.finditer(source):
+            line_id = _line_id(match)
+            if line_id:
+                identifiers.add(f"line:{line_id}")
+        for match in CONTACT_HANDLE_PATTERN.finditer(source):
+            handle = match.group(1).strip('._')
+            if handle and f"domain:{handle}" not in identifiers:
+                identifiers.add(f"handle:{handle}")
+
+    return identifiers
+
+
+class BloomFilter:
+    """Bloom filter ขนาดเล็กบน bytearray"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing จาก digest เดียว
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class IdentifierBlocklist:
+    """blocklist ของ identifier จาก spam ที่ยืนยันแล้ว
+
+    ตรวจด้วย Bloom filter ก่อน และยืนยันด้วย set จริงเมื่อ filter ตอบว่ามี
+    """
+
+    def __init__(self, db_file="identifier_blocklist.json", capacity=100000):
+        self.db_file = db_file
+        self.capacity = capacity
+        self.entries = {}
+        self.stats = {"checks": 0, "bloom_hits": 0, "confirmed_hits": 0}
+        self.dirty = False     # มี identifier ใหม่ที่ยังไม่ได้บันทึกลงไฟล์
+        self.load()
+
+    def load(self):
+        """โหลด blocklist จากไฟล์"""
+        try:
+            if os.path.exists(self.db_file):
+                with open(self.db_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            log.warning("blocklist_load_failed", f"ไม่สามารถโหลด blocklist ได้: {e}", path=self.db_file, error=str(e))
+            self.entries = {}
+        self._rebuild()
+        self.dirty = False
+
+    def save(self):
+        """บันทึก blocklist ลงไฟล์ เฉพาะเมื่อมี identifier ใหม่ตั้งแต่บันทึกครั้งก่อน"""
+        if not self.dirty:
+            return
+        try:
+            with open(self.db_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            self.dirty = False
+        except Exception as e:
+            log.warning("blocklist_save_failed", f"ไม่สามารถบันทึก blocklist ได้: {e}", path=self.db_file, error=str(e))
+
+    def _rebuild(self):
+        while self.capacity < len(self.entries) * 2:
+            self.capacity *= 2
+        self.bloom = BloomFilter(self.capacity)
+        for identifier in self.entries:
+            self.bloom.add(identifier)
+
+    def add(self, identifiers):
+        """เพิ่ม identifiers ลง blocklist คืนค่ารายการที่เพิ่มใหม่ (บันทึกลงไฟล์เมื่อเรียก save())"""
+        added = []
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for identifier in identifiers:
+            if identifier not in self.entries:
+                self.entries[identifier] = timestamp
+                self.bloom.add(identifier)
+                added.append(identifier)
+        if added:
+            if self.bloom.count > self.capacity:
+                self._rebuild()
+            self.dirty = True
+        return added
+
+    def match(self, identifiers):
+        """คืนค่า identifier ตัวแรกที่อยู่ใน blocklist หรือ None"""
+        for identifier in identifiers:
+            self.stats["checks"] += 1
+            if identifier in self.bloom:
+                self.stats["bloom_hits"] += 1
+                if identifier in self.entries:
+                    self.stats["confirmed_hits"] += 1
+                    return identifier
+        return None
+
+    def get_stats(self):
+        return dict(self.stats, entries=len(self.entries))
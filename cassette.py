@@ -0,0 +1,292 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
+
+CASSETTE_VERSION = 1
+
+# พารามิเตอร์ที่เป็นความลับ ไม่บันทึกลง cassette และไม่ใช้จับคู่ request
+SECRET_PARAMS = {"key", "api_key", "access_token"}
+
+# ไฟล์ที่ detector เรียนรู้ระหว่างสแกน (การตั้งค่า -> ไฟล์เริ่มต้น) ต้องเริ่มจากสถานะเดียวกันทุกครั้งที่ replay
+STORE_SETTINGS = {
+    "author_reputation": "author_reputation.json",
+    "identifier_blocklist": "identifier_blocklist.json",
+    "similarity_index": "spam_similarity.json"
+}
+
+def _request_error(error_type, message):
+    """สร้าง exception ของ requests ให้ตรงกับตอนบันทึก (โค้ดเดิม catch RequestException)"""
+    try:
+        import requests
+    except ImportError:
+        return RuntimeError(message)
+    return getattr(requests.exceptions, error_type, requests.exceptions.RequestException)(message)
+
+def _clean_url(url, params):
+    """รวม query string กับ params แล้วตัดพารามิเตอร์ลับออก"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query) + sorted((params or {}).items())
+    query = [(k, str(v)) for k, v in query if k not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), ""))
+
+def request_key(method, url, params=None, json_body=None):
+    """key สำหรับจับคู่ request ตอน replay (method + URL ไม่รวม key + hash ของ body)"""
+    key = f"{method.upper()} {_clean_url(url, params)}"
+    if json_body is not None:
+        body = json.dumps(json_body, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        key += " " + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+
+class ReplayResponse:
+    """response จาก cassette ที่มีเมธอดเท่าที่โค้ดในโปรเจกต์ใช้ (เหมือน requests.Response)"""
+
+    def __init__(self, interaction, realtime):
+        self.status_code = interaction["status"]
+        self.text = interaction.get("body", "")
+        self.lines = interaction.get("lines")
+        self.realtime = realtime
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            error = _request_error("HTTPError", f"{self.status_code} Error (cassette)")
+            error.response = self
+            raise error
+
+    def iter_lines(self, *args, **kwargs):
+        # เวลาก่อนบรรทัดแรกถูกหน่วงไปแล้วตอนเปิด response
+        started = time.perf_counter()
+        first_offset = self.lines[0][0] if self.lines else 0
+        for offset, line in self.lines or []:
+            if self.realtime:
+                delay = offset - first_offset - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield line.encode('utf-8')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingResponse:
+    """ห่อ response จริงของ requests แล้วบันทึกบรรทัดที่อ่านไปพร้อมเวลา (สำหรับ stream)"""
+
+    def __init__(self, response, interaction, started, cassette):
+        self._response = response
+        self._interaction = interaction
+        self._started = started
+        self._cassette = cassette
+        self._finished = False
+        interaction["lines"] = []
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_lines(self, *args, **kwargs):
+        for line in self._response.iter_lines(*args, **kwargs):
+            text = line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+            self._interaction["lines"].append([round(time.perf_counter() - self._started, 4), text])
+            yield line
+
+    def close(self):
+        # บันทึกเฉพาะบรรทัดที่อ่านจริง ตอน replay ผู้อ่านก็หยุดที่จุดเดิม
+        if not self._finished:
+            self._finished = True
+            self._interaction["elapsed"] = round(time.perf_counter() - self._started, 4)
+            self._cassette._append(self._interaction)
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Cassette:
+    """บันทึก/เล่นซ้ำ HTTP request ของ YouTube API และ AI provider
+
+    - record: ส่ง request จริงผ่าน requests แล้วเก็บ status, body (หรือบรรทัดของ stream) และเวลา
+    - replay: ตอบจากไฟล์ตามลำดับที่บันทึก ไม่ต่อเครือข่ายเลย
+      realtime=True หน่วงเวลาเท่าตอนบันทึก, False ตอบเร็วที่สุด
+    ไฟล์เป็น JSON บีบอัดด้วย gzip และไม่เก็บ header/API key
+    """
+
+    def __init__(self, path="scan.cassette.json.gz", mode="replay", realtime=False):
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.interactions = []
+        self.queues = {}
+        self.stores = {}      # ชื่อ store -> เนื้อหาไฟล์ตอนเริ่มบันทึก (None = ยังไม่มีไฟล์)
+        self.store_dir = None
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        self.interactions = data.get("interactions", [])
+        self.stores = data.get("stores", {})
+        for interaction in self.interactions:
+            self.queues.setdefault(interaction["key"], deque()).append(interaction)
+
+    def save(self):
+        """บันทึก cassette (เฉพาะโหมด record)"""
+        if self.mode != "record":
+            return
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "recorded_at": time.time(), "stores": dict(self.stores),
+                    "interactions": list(self.interactions)}
+        try:
+            with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"ไม่สามารถบันทึก cassette ได้: {e}")
+
+    def _append(self, interaction):
+        with self._lock:
+            self.interactions.append(interaction)
+            self.stats["recorded"] += 1
+
+    def request(self, method, url, params=None, json=None, stream=False, **kwargs):
+        key = request_key(method, url, params, json)
+        if self.mode == "replay":
+            return self._replay(key)
+        return self._record(key, method, url, params=params, json=json, stream=stream, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def _record(self, key, method, url, stream=False, **kwargs):
+        import requests
+        interaction = {"key": key, "method": method, "url": _clean_url(url, kwargs.get("params"))}
+        started = time.perf_counter()
+        try:
+            response = requests.request(method, url, stream=stream, **kwargs)
+        except requests.exceptions.RequestException as e:
+            interaction["error"] = {"type": type(e).__name__, "message": str(e)}
+            interaction["elapsed"] = round(time.perf_counter() - started, 4)
+            self._append(interaction)
+            raise
+        interaction["status"] = response.status_code
+        if stream:
+            return RecordingResponse(response, interaction, started, self)
+        interaction["body"] = response.text
+        interaction["elapsed"] = round(time.perf_counter() - started, 4)
+        self._append(interaction)
+        return response
+
+    def _replay(self, key):
+        with self._lock:
+            queue = self.queues.get(key)
+            interaction = queue.popleft() if queue else None
+            self.stats["misses" if interaction is None else "replayed"] += 1
+        if interaction is None:
+            raise _request_error("ConnectionError", f"ไม่มี request นี้ใน cassette: {key}")
+        if self.realtime:
+            # stream หน่วงตามเวลาของแต่ละบรรทัดแทน
+            delay = interaction["lines"][0][0] if interaction.get("lines") else interaction.get("elapsed", 0)
+            time.sleep(delay)
+        if "error" in interaction:
+            raise _request_error(interaction["error"]["type"], interaction["error"]["message"])
+        return ReplayResponse(interaction, self.realtime)
+
+    def isolate_stores(self, config):
+        """ให้ผลของการ replay ไม่ขึ้นกับไฟล์ที่ detector เรียนรู้ไว้ในเครื่อง
+
+        record: เก็บสำเนาไฟล์ store ลง cassette ก่อน detector โหลด
+        replay: เขียนสำเนานั้นลงโฟลเดอร์ชั่วคราวแล้วชี้ config ไปที่นั่น (cassette เก่าที่ไม่มีสำเนาเริ่มจาก store ว่าง)
+                และปิด verdict cache server เพราะผลใน server เปลี่ยนได้ระหว่างการ replay
+        คืนค่า config ที่ปรับแล้ว (dict ใหม่ ไม่แก้ของเดิม)
+        """
+        config = dict(config)
+        for name, default_path in STORE_SETTINGS.items():
+            settings = dict(config.get(name) or {})
+            path = settings.get("db_file", default_path)
+            if self.mode == "record":
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.stores[name] = f.read()
+                except OSError:
+                    self.stores[name] = None
+                continue
+            if self.store_dir is None:
+                self.store_dir = tempfile.mkdtemp(prefix="cassette-stores-")
+                atexit.register(shutil.rmtree, self.store_dir, True)
+            settings["db_file"] = os.path.join(self.store_dir, os.path.basename(path))
+            if self.stores.get(name) is not None:
+                with open(settings["db_file"], 'w', encoding='utf-8') as f:
+                    f.write(self.stores[name])
+            config[name] = settings
+        if self.mode == "replay" and config.get("verdict_cache"):
+            config["verdict_cache"] = dict(config["verdict_cache"], host=None)
+        return config
+
+    def get_stats(self):
+        return dict(self.stats, mode=self.mode, path=self.path, store_dir=self.store_dir)
+
+
+# cassette ที่ใช้งานอยู่ (None = ส่ง request จริงตามปกติ)
+_active = None
+
+def http():
+    """ตัวส่ง HTTP ที่โค้ดทุกส่วนใช้: cassette ที่เปิดอยู่ หรือโมดูล requests"""
+    if _active is not None:
+        return _active
+    import requests
+    return requests
+
+def isolate_stores(config):
+    """ปรับ config ของ detector ตาม cassette ที่เปิดอยู่ (ไม่มี cassette คืนค่า config เดิม)"""
+    if _active is None:
+        return config
+    return _active.isolate_stores(config)
+
+def configure(settings):
+    """เปิดใช้ cassette ตามการตั้งค่า
+
+    settings: {"mode": "record"/"replay"/None, "path": str, "realtime": bool}
+    """
+    global _active
+    if not settings or settings.get("mode") not in ("record", "replay"):
+        return None
+    try:
+        _active = Cassette(settings.get("path") or "scan.cassette.json.gz", settings["mode"], settings.get("realtime", False))
+    except (OSError, ValueError) as e:
+        print(f"ไม่สามารถเปิด cassette ได้: {e}")
+        return None
+    if _active.mode == "record":
+        atexit.register(_active.save)
+    print(f"📼 Cassette: {_active.mode} ({_active.path})")
+    return _active
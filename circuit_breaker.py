@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+class CircuitBreaker:
+    """Circuit breaker ต่อ AI provider หนึ่งตัว
+
+    closed    -> ส่ง request ได้ตามปกติ
+    open      -> ล้มเหลวติดกันเกิน failure_threshold ครั้ง ตัดทันทีไม่รอ socket
+    half_open -> ครบ reset_timeout แล้ว กำลัง probe อยู่เบื้องหลัง
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, probe_fn=None, failure_threshold=3, reset_timeout=30):
+        """
+        name: ชื่อ provider
+        probe_fn: ฟังก์ชันตรวจสุขภาพ provider คืนค่า True ถ้าใช้งานได้
+        failure_threshold: จำนวนครั้งที่ล้มเหลวติดกันก่อนเปิดวงจร
+        reset_timeout: วินาทีที่รอก่อน probe แบบ half-open
+        """
+        self.name = name
+        self.probe_fn = probe_fn
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.fast_failures = 0
+        self.transitions = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def allow_request(self):
+        """คืนค่า True ถ้าส่ง request ไปยัง provider ได้"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            self.fast_failures += 1
+            return False
+
+    def record_success(self):
+        """บันทึกว่า request สำเร็จ"""
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        """บันทึกว่า request ล้มเหลว และเปิดวงจรถ้าเกินเกณฑ์"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        # ต้องถือ lock อยู่แล้ว
+        self._transition(self.OPEN)
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.reset_timeout, self._half_open_probe)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _half_open_probe(self):
+        """probe provider เบื้องหลัง ถ้าใช้ได้ปิดวงจร ถ้าไม่ได้เปิดวงจรต่อ"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return
+            self._transition(self.HALF_OPEN)
+
+        try:
+            healthy = bool(self.probe_fn()) if self.probe_fn else True
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            if self.state != self.HALF_OPEN:
+                return
+            if healthy:
+                self.consecutive_failures = 0
+                self._transition(self.CLOSED)
+            else:
+                self._open()
+
+    def _transition(self, new_state):
+        if new_state == self.state:
+            return
+        self.transitions.append({
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "from": self.state,
+            "to": new_state
+        })
+        self.state = new_state
+
+    def stats(self):
+        """สถานะของ breaker สำหรับแสดงใน stats"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "fast_failures": self.fast_failures,
+                "transitions": list(self.transitions)
+            }
@@ -0,0 +1,206 @@
+import math
+import mmap
+import tempfile
+from array import array
+from datetime import datetime, timezone
+
+class _Interner:
+    """เก็บค่าที่ซ้ำกันบ่อย (ผู้เขียน, channel) ไว้ครั้งเดียว แล้วอ้างอิงด้วย index"""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def intern(self, value):
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _StringBuffer:
+    """ข้อความ UTF-8 ต่อกันใน buffer เดียว อ้างอิงด้วย offset
+
+    เมื่อเกิน spill_threshold ไบต์ ย้ายไปเก็บในไฟล์ชั่วคราวแล้วอ่านผ่าน mmap
+    """
+
+    def __init__(self, spill_threshold, spill_dir=None):
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+        self.file = None
+        self._map = None
+
+    def append(self, text):
+        encoded = (text or "").encode('utf-8')
+        if self.file is None:
+            self.data += encoded
+            if self.spill_threshold is not None and len(self.data) > self.spill_threshold:
+                self._spill()
+        else:
+            self.file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def _spill(self):
+        self.file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self.file.write(self.data)
+        self.data = bytearray()
+
+    def get(self, position):
+        start, end = self.offsets[position], self.offsets[position + 1]
+        if self.file is None:
+            return self.data[start:end].decode('utf-8')
+        if self._map is None or end > len(self._map):
+            # map ใหม่ให้ครอบคลุมข้อมูลที่เขียนเพิ่มหลัง map ครั้งก่อน
+            self.file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[start:end].decode('utf-8')
+
+    @property
+    def spilled(self):
+        return self.file is not None
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return math.nan
+
+
+class CommentTable:
+    """ที่เก็บความคิดเห็นแบบ column สำหรับการสแกนขนาดใหญ่
+
+    - ID และข้อความเก็บเป็น UTF-8 ต่อกันใน buffer เดียวพร้อม offset
+    - เวลาโพสต์เก็บเป็น timestamp ใน array, ผู้เขียนและ channel เก็บเป็น index ของตาราง intern
+    - ผลตัดสิน spam เก็บเป็น bitmap แทนการคัดลอก dict
+    - ข้อความที่เกิน spill_threshold ไบต์ย้ายไปไฟล์ชั่วคราว (mmap)
+
+    table[i] และการ iterate คืนค่า dict แบบเดียวกับที่ get_video_comments เคยคืน (สร้างเมื่อเรียกใช้)
+    """
+
+    def __init__(self, spill_threshold=64 * 1024 * 1024, spill_dir=None):
+        """
+        spill_threshold: ขนาด (ไบต์) ของข้อความในหน่วยความจำก่อนย้ายไปไฟล์ (None = ไม่ย้าย)
+        spill_dir: โฟลเดอร์ของไฟล์ชั่วคราว (None = โฟลเดอร์ temp ของระบบ)
+        """
+        self.ids = _StringBuffer(spill_threshold, spill_dir)
+        self.texts = _StringBuffer(spill_threshold, spill_dir)
+        self.timestamps = array('d')
+        self.author_index = array('I')
+        self.channel_index = array('I')
+        self.authors = _Interner()    # (ชื่อผู้เขียน, authorChannelId)
+        self.channels = _Interner()
+        self.raw_published = {}       # เวลาโพสต์ที่ไม่ใช่ ISO 8601 (เช่น "2 วันที่แล้ว")
+        self.spam_bits = bytearray()
+
+    def append(self, comment_id, text, author, author_channel_id=None, published_at=None, channel_id=None):
+        """เพิ่มความคิดเห็น คืนค่า index"""
+        position = len(self.timestamps)
+        self.ids.append(comment_id)
+        self.texts.append(text)
+        timestamp = _parse_timestamp(published_at)
+        if math.isnan(timestamp) and published_at:
+            self.raw_published[position] = published_at
+        self.timestamps.append(timestamp)
+        self.author_index.append(self.authors.intern((author, author_channel_id)))
+        self.channel_index.append(self.channels.intern(channel_id))
+        if position % 8 == 0:
+            self.spam_bits.append(0)
+        return position
+
+    def extend(self, comments):
+        """เพิ่มจาก list ของ comment dict"""
+        for comment in comments:
+            self.append(comment['id'], comment['text'], comment.get('author'), comment.get('author_channel_id'),
+                        comment.get('published_at'), comment.get('channel_id'))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def comment_id(self, position):
+        return self.ids.get(position)
+
+    def text(self, position):
+        return self.texts.get(position)
+
+    def author_channel_id(self, position):
+        return self.authors.values[self.author_index[position]][1]
+
+    def published_at(self, position):
+        timestamp = self.timestamps[position]
+        if math.isnan(timestamp):
+            return self.raw_published.get(position, "")
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        author, author_channel_id = self.authors.values[self.author_index[position]]
+        return {
+            'id': self.ids.get(position),
+            'channel_id': self.channels.values[self.channel_index[position]],
+            'text': self.texts.get(position),
+            'author': author,
+            'author_channel_id': author_channel_id,
+            'published_at': self.published_at(position)
+        }
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def set_spam(self, position, is_spam=True):
+        if is_spam:
+            self.spam_bits[position >> 3] |= 1 << (position & 7)
+        else:
+            self.spam_bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def is_spam(self, position):
+        return bool(self.spam_bits[position >> 3] & (1 << (position & 7)))
+
+    def spam_indices(self):
+        """index ของความคิดเห็นที่เป็น spam เรียงตามลำดับ"""
+        for byte_index, byte in enumerate(self.spam_bits):
+            while byte:
+                low = byte & -byte
+                yield (byte_index << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def spam_count(self):
+        return sum(bin(byte).count("1") for byte in self.spam_bits)
+
+    def nbytes(self):
+        """หน่วยความจำโดยประมาณของข้อมูลแบบ column (ไม่รวมตาราง intern)"""
+        arrays = (self.timestamps, self.author_index, self.channel_index)
+        return (self.ids.nbytes() + self.texts.nbytes() + len(self.spam_bits)
+                + sum(a.itemsize * len(a) for a in arrays))
+
+    @property
+    def spilled(self):
+        return self.texts.spilled or self.ids.spilled
+
+    def close(self):
+        """ปิดไฟล์ชั่วคราว (ถ้ามี)"""
+        self.ids.close()
+        self.texts.close()
@@ -1,6 +1,5 @@
 import json
 import os
-import requests
 from getpass import getpass
 
 class ConfigManager:
@@ -20,7 +19,23 @@ class ConfigManager:
                 "lmstudio": {"host": "localhost", "port": "1234"},
                 "ollama": {"host": "localhost", "port": "11434", "model": "mistral"}
             },
-            "current_provider": "lmstudio"
+            "current_provider": "lmstudio",
+            "llm_timeout": 30,
+            "llm_stream": True,
+            "llm_need_reason": False,
+            "llm_hedge_delay": 3.0,
+            "llm_circuit_breaker": {"failure_threshold": 3, "reset_timeout": 30},
+            "author_reputation": {"db_file": "author_reputation.json", "max_authors": 50000, "half_life_days": 30,
+                                  "spam_threshold": 2.0, "clean_threshold": 3.0},
+            "trusted_author_max_score": 2,
+            "identifier_blocklist": {"db_file": "identifier_blocklist.json", "capacity": 100000},
+            "similarity_index": {"db_file": "spam_similarity.json", "max_entries": 5000, "threshold": 0.8},
+            "llm_budget": {"max_calls": None, "max_tokens": None},
+            "verdict_cache": {"host": None, "port": 9470, "ttl": 86400},
+            "metrics": {"enabled": False, "port": 9464, "json_path": "metrics.json"},
+            "tracing": {"enabled": False, "sample_rate": 0.01, "slow_threshold_ms": 5000, "output": "scan_trace.json"},
+            "logging": {"mode": "human", "path": None, "buffer_lines": 1000},
+            "cassette": {"mode": None, "path": "scan.cassette.json.gz", "realtime": False}
         }
 
         if os.path.exists(self.config_file):
@@ -43,6 +58,15 @@ class ConfigManager:
                     if "current_provider" in old_config:
                         config["current_provider"] = old_config["current_provider"]
                     
+                    # คงการตั้งค่าอื่นๆ ไว้ (metrics ฯลฯ) ค่าที่เป็น dict รวมกับค่าเริ่มต้นเพื่อให้ได้ key ใหม่ด้วย
+                    for key, value in old_config.items():
+                        if key in ("youtube_api_key", "youtube_api_keys", "current_youtube_key", "ai_providers", "current_provider"):
+                            continue
+                        if isinstance(config.get(key), dict) and isinstance(value, dict):
+                            config[key] = {**config[key], **value}
+                        else:
+                            config[key] = value
+                    
                     return config
             except:
                 pass
@@ -103,6 +127,48 @@ class ConfigManager:
             
             input("\nกด Enter เพื่อดำเนินการต่อ...")
 
+    def get_provider_pool(self):
+        """รายชื่อ AI providers ที่ตั้งค่าไว้ใช้งานได้ เรียงตามลำดับ (provider ปัจจุบันก่อน)"""
+        default_urls = {
+            "openai": "https://api.openai.com/v1/chat/completions",
+            "deepseek": "https://api.deepseek.com/v1/chat/completions",
+            "grok": "https://api.grok.x.ai/v1/chat/completions"
+        }
+        
+        names = list(self.config["ai_providers"].keys())
+        current = self.config["current_provider"]
+        if current in names:
+            names.remove(current)
+            names.insert(0, current)
+        
+        pool = []
+        for name in names:
+            settings = dict(self.config["ai_providers"][name])
+            settings["name"] = name
+            
+            if name in default_urls:
+                # provider แบบ cloud ต้องมี API key
+                if not settings.get("api_key"):
+                    continue
+                settings.setdefault("url", default_urls[name])
+            elif name == "lmstudio":
+                settings.setdefault("url", f"http://{settings.get('host', 'localhost')}:{settings.get('port', '1234')}/v1/chat/completions")
+            elif name == "ollama":
+                settings.setdefault("model", "mistral")
+                settings.setdefault("url", f"http://{settings.get('host', 'localhost')}:{settings.get('port', '11434')}/api/chat")
+            elif "url" not in settings:
+                continue
+            
+            pool.append(settings)
+        return pool
+
+    def get_detector_settings(self):
+        """การตั้งค่าของ YouTubeSpamDetector ที่อ่านจาก config.json (ไม่รวม API key และ provider)"""
+        keys = ("llm_timeout", "llm_stream", "llm_need_reason", "llm_hedge_delay", "llm_circuit_breaker",
+                "author_reputation", "trusted_author_max_score", "identifier_blocklist", "similarity_index",
+                "llm_budget", "verdict_cache")
+        return {key: self.config[key] for key in keys if self.config.get(key) is not None}
+
     def setup_youtube_api(self):
         """ตั้งค่า YouTube API"""
         print("\n=== YouTube API Keys ===")
@@ -246,6 +312,7 @@ class ConfigManager:
         
         # ดึงรายชื่อ models
         try:
+            import requests
             url = f"http://{host}:{port}/api/tags"
             response = requests.get(url)
             models = [model['name'] for model in response.json()['models']]
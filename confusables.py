@@ -0,0 +1,129 @@
+import re
+import unicodedata
+
+# อักขระหน้าตาคล้ายตัวอักษรละตินที่ NFKC ไม่ได้แปลงให้ (Cyrillic/Greek ฯลฯ)
+# у/У และ ф/Ф แปลงตามที่ใช้ในชื่อเว็บพนัน (уfa = ufa, фafa = fafa) ไม่ใช่ตามรูปร่าง
+CONFUSABLES = {
+    # Cyrillic ตัวเล็ก
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o',
+    'р': 'p', 'с': 'c', 'т': 't', 'у': 'u', 'х': 'x', 'і': 'i', 'ї': 'i', 'ј': 'j',
+    'ѕ': 's', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w', 'ӏ': 'l', 'ү': 'y', 'һ': 'h', 'ф': 'f',
+    # Cyrillic ตัวใหญ่
+    'А': 'A', 'В': 'B', 'Е': 'E', 'К': 'K', 'М': 'M', 'Н': 'H', 'О': 'O', 'Р': 'P',
+    'С': 'C', 'Т': 'T', 'У': 'U', 'Х': 'X', 'І': 'I', 'Ј': 'J', 'Ѕ': 'S', 'Ү': 'Y',
+    'Ф': 'F',
+    # Greek
+    'α': 'a', 'ο': 'o', 'ρ': 'p', 'ν': 'v', 'ι': 'i', 'κ': 'k', 'χ': 'x', 'υ': 'u',
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M',
+    'Ν': 'N', 'Ο': 'O', 'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X',
+    # อื่นๆ
+    'ɡ': 'g', 'ı': 'i', 'ȷ': 'j', 'ℓ': 'l'
+}
+
+REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+CLASS_SPECIAL = set('\\]^-[')
+
+def skeleton_char(char):
+    """แปลงอักขระหนึ่งตัวเป็นตัวแทน (skeleton) แบบหนึ่งต่อหนึ่ง
+
+    ใช้ NFKC (ตัวอักษรคณิตศาสตร์ 𝙼/𝐦, full-width ฯลฯ) แล้วตามด้วยตาราง CONFUSABLES
+    อักขระที่ NFKC แปลงเป็นหลายตัว (เช่น สระอำ) คงไว้ตามเดิม
+    """
+    normalized = unicodedata.normalize('NFKC', char)
+    if len(normalized) != 1:
+        return char
+    return CONFUSABLES.get(normalized, normalized)
+
+
+class _SkeletonTable(dict):
+    """ตารางสำหรับ str.translate ที่คำนวณและจำผลของแต่ละอักขระเมื่อเจอครั้งแรก"""
+
+    def __missing__(self, codepoint):
+        value = skeleton_char(chr(codepoint))
+        self[codepoint] = value
+        return value
+
+
+_table = _SkeletonTable()
+
+def skeleton(text):
+    """แปลงข้อความทั้งข้อความเป็น skeleton (ความยาวเท่าเดิม ตัวพิมพ์เล็ก/ใหญ่คงเดิม)"""
+    return text.translate(_table)
+
+def _escape_literal(char):
+    return '\\' + char if char in REGEX_SPECIAL else char
+
+def _escape_member(char):
+    return '\\' + char if char in CLASS_SPECIAL else char
+
+def _rewrite_class(pattern, start, ignore_case):
+    """เขียน character class ใหม่ในรูป skeleton คืนค่า (ตำแหน่งถัดไป, class ใหม่)"""
+    i = start + 1
+    negate = False
+    if i < len(pattern) and pattern[i] == '^':
+        negate = True
+        i += 1
+
+    raw_items = []  # escape และ range ที่คงรูปเดิม
+    members = {}    # อักขระเดี่ยวหลังแปลง (dict เพื่อคงลำดับ)
+    first = True
+    while i < len(pattern) and (pattern[i] != ']' or first):
+        first = False
+        char = pattern[i]
+        if char == '\\':
+            raw_items.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if i + 2 < len(pattern) and pattern[i + 1] == '-' and pattern[i + 2] not in ']\\':
+            low, high = char, pattern[i + 2]
+            if skeleton_char(low) == low and skeleton_char(high) == high:
+                raw_items.append(f"{low}-{high}")
+            elif ord(high) - ord(low) <= 1024:
+                # range ของอักขระพิเศษ แตกเป็นรายตัวแล้วแปลง
+                for codepoint in range(ord(low), ord(high) + 1):
+                    mapped = skeleton_char(chr(codepoint))
+                    members[mapped.lower() if ignore_case else mapped] = True
+            else:
+                raw_items.append(f"{low}-{high}")
+                members[f"{skeleton_char(low)}-{skeleton_char(high)}"] = True
+            i += 3
+            continue
+        mapped = skeleton_char(char)
+        members[mapped.lower() if ignore_case else mapped] = True
+        i += 1
+
+    if i >= len(pattern):
+        raise re.error("unterminated character set", pattern, start)
+
+    parts = list(raw_items)
+    for member in members:
+        parts.append(member if len(member) == 3 and member[1] == '-' else _escape_member(member))
+
+    if not negate and not raw_items and len(members) == 1:
+        member = next(iter(members))
+        if len(member) == 1:
+            return i + 1, _escape_literal(member)
+    return i + 1, '[' + ('^' if negate else '') + ''.join(parts) + ']'
+
+def rewrite_pattern(pattern):
+    """เขียน regex ใหม่ให้ทำงานกับข้อความที่ผ่าน skeleton() แล้ว
+
+    อักขระ literal และสมาชิกใน character class ถูกแปลงเป็น skeleton
+    class ที่ซ้ำกันหลังแปลง (เช่น [𝙼𝚖𝗺𝐦mм] ในโหมด (?i)) จะยุบเหลือตัวเดียว
+    """
+    ignore_case = pattern.startswith('(?i)')
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            out.append(pattern[i:i + 2])
+            i += 2
+        elif char == '[':
+            i, rewritten = _rewrite_class(pattern, i, ignore_case)
+            out.append(rewritten)
+        else:
+            mapped = skeleton_char(char)
+            out.append(char if mapped == char else _escape_literal(mapped))
+            i += 1
+    return ''.join(out)
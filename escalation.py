@@ -0,0 +1,96 @@
+import heapq
+import math
+
+# จำนวน token โดยประมาณของ prompt ที่ไม่รวมข้อความ และของคำตอบ
+PROMPT_OVERHEAD_TOKENS = 180
+ANSWER_TOKENS = 60
+
+def estimate_tokens(text):
+    """ประมาณจำนวน token ที่ใช้ต่อการเรียก AI หนึ่งครั้ง (ภาษาไทย ~1 token ต่อ 2-3 ตัวอักษร)"""
+    return PROMPT_OVERHEAD_TOKENS + math.ceil(len(text) / 2.5) + ANSWER_TOKENS
+
+
+class EscalationScheduler:
+    """จัดลำดับความคิดเห็นที่ต้องใช้ AI ภายในงบของการสแกนหนึ่งครั้ง
+
+    - เก็บความคิดเห็นที่ pattern score ไม่พอตัดสินไว้ก่อน แทนการเรียก AI ตามลำดับที่เข้ามา
+    - ความสำคัญ = pattern score x ความไม่แน่นอน ความคิดเห็นที่คะแนนกลางๆ ได้ใช้ AI ก่อน
+      ส่วนที่คะแนนต่ำมาก (เช่น @mention อย่างเดียว) หรือสูงมากจนชัดเจนแล้วได้ทีหลัง
+    - ใช้งบได้ทั้งจำนวนครั้ง (max_calls) และจำนวน token โดยประมาณ (max_tokens)
+    """
+
+    def __init__(self, max_calls=None, max_tokens=None, uncertain_score=6.0, spread=3.0):
+        """
+        max_calls: จำนวนครั้งสูงสุดที่เรียก AI ได้ต่อการสแกน (None = ไม่จำกัด)
+        max_tokens: จำนวน token โดยประมาณสูงสุดต่อการสแกน (None = ไม่จำกัด)
+        uncertain_score: pattern score ที่ถือว่าไม่แน่ใจที่สุด (โอกาสเป็น spam 50%)
+        spread: ความกว้างของช่วงคะแนนที่ยังไม่แน่ใจ
+        """
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.uncertain_score = uncertain_score
+        self.spread = spread
+        self.candidates = []
+        self._counter = 0
+        self.stats = {"candidates": 0, "escalated": 0, "llm_requests": 0, "free": 0,
+                      "budget_exhausted": 0, "tokens_estimated": 0}
+
+    def priority(self, pattern_score):
+        """คะแนนความคุ้มค่าของการใช้ AI กับความคิดเห็นนี้"""
+        spam_probability = 1 / (1 + math.exp(-(pattern_score - self.uncertain_score) / self.spread))
+        uncertainty = 1 - abs(2 * spam_probability - 1)
+        return pattern_score * uncertainty
+
+    def add(self, item, pattern_score):
+        """เพิ่มความคิดเห็นที่รอ AI (item: อะไรก็ได้ที่ผู้เรียกใช้อ้างอิงกลับ)"""
+        self._counter += 1
+        # heapq เป็น min-heap ใช้ค่าลบเพื่อเอาความสำคัญสูงสุดออกก่อน ลำดับที่เข้ามาใช้ตัดสินเมื่อเท่ากัน
+        heapq.heappush(self.candidates, (-self.priority(pattern_score), self._counter, item))
+        self.stats["candidates"] += 1
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def items(self):
+        """item ที่ยังรอ AI อยู่ทั้งหมด (ไม่เรียงตามลำดับความสำคัญ และไม่นำออกจากคิว)"""
+        return [item for _, _, item in self.candidates]
+
+    def _can_spend(self, tokens):
+        if self.max_calls is not None and self.stats["llm_requests"] >= self.max_calls:
+            return False
+        if self.max_tokens is not None and self.stats["tokens_estimated"] + tokens > self.max_tokens:
+            return False
+        return True
+
+    def drain(self, text_of=None, is_free=None):
+        """คืนค่า (item, use_llm) ตามลำดับความสำคัญ จนหมดรายการ
+
+        use_llm บอกว่ายังมีงบพอให้เรียก AI หรือไม่ งบจะถูกหักเมื่อผู้เรียกแจ้งผ่าน record()
+        ว่าส่ง request ไปจริง (ความคิดเห็นที่ตัดสินได้ก่อนถึง AI หรือ circuit เปิดอยู่จึงไม่เสียงบ)
+        text_of: ฟังก์ชันดึงข้อความจาก item ใช้ประมาณ token (จำเป็นเมื่อตั้ง max_tokens)
+        is_free: ฟังก์ชันบอกว่า item ได้คำตอบโดยไม่เสียงบ (เช่น มีผลใน verdict cache แล้ว)
+        """
+        while self.candidates:
+            _, _, item = heapq.heappop(self.candidates)
+            if is_free and is_free(item):
+                self.stats["free"] += 1
+                yield item, True
+                continue
+            tokens = estimate_tokens(text_of(item)) if text_of else 0
+            yield item, self._can_spend(tokens)
+
+    def record(self, text, requests, decided_by):
+        """บันทึกผลของ item ที่ได้จาก drain()
+
+        requests: จำนวน request ที่ส่งไปยัง AI จริง (รวม hedge) ใช้หักงบ
+        decided_by: ผลตัดสินจาก detector.last_result
+        """
+        if requests > 0:
+            self.stats["escalated"] += 1
+            self.stats["llm_requests"] += requests
+            self.stats["tokens_estimated"] += requests * estimate_tokens(text)
+        if decided_by == "budget_exhausted":
+            self.stats["budget_exhausted"] += 1
+
+    def get_stats(self):
+        return dict(self.stats, max_calls=self.max_calls, max_tokens=self.max_tokens)
@@ -0,0 +1,78 @@
+import json
+import re
+
+# คะแนนถือว่าครบเมื่อมีอักขระอื่นตามหลังตัวเลขแล้ว (กันกรณี "8" ของ "85")
+SCORE_DONE = re.compile(r'คะแนน:\s*\d+\D')
+# ผลวิเคราะห์ครบเมื่อจบบรรทัดแล้ว
+VERDICT_DONE = re.compile(r'ผลวิเคราะห์:[^\n]*\S[^\n]*\n')
+
+def _decode_lines(lines):
+    """แปลง bytes เป็น str แบบ utf-8 (SSE มักไม่ระบุ charset)"""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if line:
+            yield line
+
+def _content_from_chunk(chunk):
+    """ดึงข้อความจาก chunk แบบ OpenAI (delta) หรือคำตอบแบบไม่ stream (message)"""
+    choices = chunk.get('choices') or []
+    if not choices:
+        return ""
+    choice = choices[0]
+    if 'delta' in choice:
+        return choice['delta'].get('content') or ""
+    if 'message' in choice:
+        return choice['message'].get('content') or ""
+    return choice.get('text') or ""
+
+def iter_sse_content(lines):
+    """อ่าน stream แบบ Server-Sent Events ของ OpenAI/LM Studio/Deepseek/Grok"""
+    for line in _decode_lines(lines):
+        if line.startswith('data:'):
+            data = line[5:].strip()
+            if data == '[DONE]':
+                return
+            try:
+                yield _content_from_chunk(json.loads(data))
+            except ValueError:
+                continue
+        elif line.startswith('{'):
+            # provider ที่ไม่รองรับ stream ส่งคำตอบเต็มกลับมาทีเดียว
+            try:
+                yield _content_from_chunk(json.loads(line))
+            except ValueError:
+                continue
+
+def iter_ndjson_content(lines):
+    """อ่าน stream แบบ NDJSON ของ Ollama"""
+    for line in _decode_lines(lines):
+        try:
+            chunk = json.loads(line)
+        except ValueError:
+            continue
+        yield chunk.get('message', {}).get('content') or ""
+        if chunk.get('done'):
+            return
+
+def answer_is_decided(text):
+    """คืนค่า True เมื่อได้ทั้งคะแนนและผลวิเคราะห์ครบแล้ว"""
+    return bool(SCORE_DONE.search(text) and VERDICT_DONE.search(text))
+
+def read_streamed_answer(lines, provider_name, need_reason=False):
+    """ประกอบคำตอบจาก stream และหยุดทันทีเมื่อได้คะแนนและผลวิเคราะห์
+
+    คืนค่า (คำตอบ, หยุดก่อนจบหรือไม่)
+    """
+    if provider_name == "ollama":
+        pieces = iter_ndjson_content(lines)
+    else:
+        pieces = iter_sse_content(lines)
+
+    answer = ""
+    for piece in pieces:
+        answer += piece
+        if not need_reason and answer_is_decided(answer):
+            return answer, True
+    return answer, False
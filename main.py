@@ -1,12 +1,12 @@
-from spam_detector import YouTubeSpamDetector
+import time
+_STARTED = time.perf_counter()
+
 import getpass
 import os
 from urllib.parse import urlparse, parse_qs
-import requests
-from bs4 import BeautifulSoup
-import json
-import re
-from config_manager import ConfigManager
+
+# โมดูลอื่นๆ import เมื่อใช้งานจริงในแต่ละโหมด
+# (โหมดทดสอบข้อความไม่ต้องโหลด requests/sqlite/scraper)
 
 def get_api_key():
     """รับ API key จากผู้ใช้หรือใช้ค่าเริ่มต้น"""
@@ -41,10 +41,28 @@ def extract_video_id(url):
     
     raise ValueError("URL ไม่ถูกต้อง กรุณาใส่ URL ของ YouTube video")
 
+def add_comment_item(comments, item):
+    """เพิ่ม commentThread จาก YouTube API ลง CommentTable"""
+    snippet = item['snippet']['topLevelComment']['snippet']
+    comments.append(
+        item['snippet']['topLevelComment']['id'],
+        snippet['textDisplay'],
+        snippet['authorDisplayName'],
+        snippet.get('authorChannelId', {}).get('value'),
+        snippet['publishedAt'],
+        item['snippet'].get('channelId')
+    )
+
 def get_video_comments(api_key, video_id):
-    """ดึงความคิดเห็นทั้งหมดจาก YouTube video"""
+    """ดึงความคิดเห็นทั้งหมดจาก YouTube video (คืนค่า CommentTable)"""
+    import requests
+    import cassette
+    from comment_table import CommentTable
+    from metrics import registry as scan_metrics
+    from tracing import tracer
+    
     base_url = "https://www.googleapis.com/youtube/v3/commentThreads"
-    comments = []
+    comments = CommentTable()
     
     params = {
         'part': 'snippet',
@@ -56,40 +74,32 @@ def get_video_comments(api_key, video_id):
     
     try:
         print("\nกำลังดึงข้อมูลความคิดเห็น...")
-        response = requests.get(base_url, params=params)
+        with scan_metrics.timer("youtube_fetch_seconds"), tracer.span("commentThreads.list", cat="youtube", page=1):
+            response = cassette.http().get(base_url, params=params)
+        scan_metrics.inc("youtube_quota_units_total", labels={"method": "commentThreads.list"})
         response.raise_for_status()
         
         data = response.json()
         items = data.get('items', [])
+        scan_metrics.inc("comments_fetched_total", len(items))
         
         for item in items:
-            comment = item['snippet']['topLevelComment']['snippet']
-            comment_data = {
-                'id': item['snippet']['topLevelComment']['id'],
-                'text': comment['textDisplay'],
-                'author': comment['authorDisplayName'],
-                'published_at': comment['publishedAt']
-            }
-            comments.append(comment_data)
+            add_comment_item(comments, item)
         
         # ถ้ามีหน้าถัดไป ดึงข้อมูลเพิ่ม
         while 'nextPageToken' in data and len(comments) < 500:
             params['pageToken'] = data['nextPageToken']
-            response = requests.get(base_url, params=params)
+            with scan_metrics.timer("youtube_fetch_seconds"), tracer.span("commentThreads.list", cat="youtube", fetched=len(comments)):
+                response = cassette.http().get(base_url, params=params)
+            scan_metrics.inc("youtube_quota_units_total", labels={"method": "commentThreads.list"})
             response.raise_for_status()
             
             data = response.json()
             items = data.get('items', [])
+            scan_metrics.inc("comments_fetched_total", len(items))
             
             for item in items:
-                comment = item['snippet']['topLevelComment']['snippet']
-                comment_data = {
-                    'id': item['snippet']['topLevelComment']['id'],
-                    'text': comment['textDisplay'],
-                    'author': comment['authorDisplayName'],
-                    'published_at': comment['publishedAt']
-                }
-                comments.append(comment_data)
+                add_comment_item(comments, item)
         
         print(f"ดึงข้อมูลสำเร็จ! พบความคิดเห็นทั้งหมด {len(comments)} ข้อความ")
         return comments
@@ -103,23 +113,47 @@ def test_single_comment(detector):
     """ทดสอบข้อความเดี่ยว"""
     comment = input("\nใส่ข้อความที่ต้องการตรวจสอบ: ")
     is_spam = detector.is_spam(comment)
+    detector.save_stores()
     print(f"ผลการตรวจสอบ: {'🚫 Spam' if is_spam else '✅ ไม่ใช่ Spam'}\n")
 
 def analyze_video(detector, url):
     """วิเคราะห์ความคิดเห็นในวิดีโอ"""
+    from escalation import EscalationScheduler
+    from results_store import ResultsStore
+    results_store = ResultsStore()
+    comments = None
     try:
         video_id = extract_video_id(url)
         comments = get_video_comments(detector.api_key, video_id)
         
         if comments:
-            spam_comments = []
             total_comments = len(comments)
-            spam_count = 0
             
-            for comment in comments:
-                if detector.is_spam(comment['text']):
-                    spam_count += 1
-                    spam_comments.append(comment)
+            # รอบแรก: ตัดสินทุกอย่างที่ไม่ต้องใช้ AI ส่วนที่เหลือรอจัดลำดับตามงบ
+            scheduler = EscalationScheduler(**detector.llm_budget)
+            for index, comment in enumerate(comments):
+                spam = detector.is_spam(comment['text'], comment['author_channel_id'], defer_llm=True)
+                if detector.last_result["decided_by"] == "pending_llm":
+                    scheduler.add((index, detector.last_result), detector.last_result["pattern_score"])
+                    continue
+                comments.set_spam(index, spam)
+                results_store.add(comment, video_id, detector.last_result)
+            
+            # รอบสอง: ใช้ AI กับความคิดเห็นที่คุ้มค่าที่สุดก่อนจนงบหมด
+            # ข้อความที่ scanner เครื่องอื่นเคยถาม AI แล้ว ดึงผลจาก verdict cache ในรอบเดียวและไม่นับงบ
+            detector.prefetch_verdicts([comments.text(index) for index, _ in scheduler.items()])
+            for (index, result), use_llm in scheduler.drain(lambda item: comments.text(item[0]),
+                                                            lambda item: detector.has_cached_verdict(comments.text(item[0]))):
+                comment = comments[index]
+                requests_before = detector.llm_requests
+                comments.set_spam(index, detector.resolve_escalation(comment['text'], comment['author_channel_id'], result, use_llm))
+                scheduler.record(comment['text'], detector.llm_requests - requests_before, result["decided_by"])
+                results_store.add(comment, video_id, result)
+            
+            spam_count = comments.spam_count()
+            
+            # บันทึกประวัติผู้เขียน blocklist และดัชนีความคล้ายหลังสแกนเสร็จ
+            detector.save_stores()
             
             spam_percentage = (spam_count / total_comments * 100) if total_comments > 0 else 0
             
@@ -128,9 +162,22 @@ def analyze_video(detector, url):
             print(f"🚫 จำนวน Spam: {spam_count}")
             print(f"📈 เปอร์เซ็นต์ Spam: {spam_percentage:.1f}%")
             
-            if spam_comments:
+            budget = scheduler.get_stats()
+            if budget["candidates"]:
+                print(f"🤖 ใช้ AI ตรวจ {budget['escalated']}/{budget['candidates']} ข้อความ"
+                      + (f" (ใช้ผลจาก cache {budget['free']} ข้อความ)" if budget["free"] else "")
+                      + (f" (งบหมด ใช้ Pattern Score ตัดสิน {budget['budget_exhausted']} ข้อความ)" if budget["budget_exhausted"] else ""))
+            
+            # แสดงสถานะ circuit breaker ของ AI provider ที่เคยเปลี่ยนสถานะ
+            for name, breaker in detector.get_stats()["llm_breakers"].items():
+                if breaker["transitions"]:
+                    print(f"⚡ {name.upper()}: circuit {breaker['state']} "
+                          f"(เปลี่ยนสถานะ {len(breaker['transitions'])} ครั้ง, ข้าม AI {breaker['fast_failures']} ครั้ง)")
+            
+            if spam_count:
                 print("\n🚫 ความคิดเห็นที่เป็น Spam ทั้งหมด:")
-                for i, comment in enumerate(spam_comments, 1):
+                for i, index in enumerate(comments.spam_indices(), 1):
+                    comment = comments[index]
                     print(f"\n{i}. โดย: {comment['author']}")
                     print(f"   เมื่อ: {comment['published_at']}")
                     print(f"   ข้อความ: {comment['text']}")
@@ -139,83 +186,107 @@ def analyze_video(detector, url):
                 # ถามว่าต้องการจัดการ spam หรือไม่
                 action = input("\nต้องการจัดการความคิดเห็น Spam หรือไม่? (1=ลบ, 2=มาร์คเป็น spam, 0=ข้าม): ")
                 if action in ['1', '2']:
-                    for comment in spam_comments:
+                    handled = []
+                    for index in comments.spam_indices():
+                        comment_id = comments.comment_id(index)
                         if action == '1':
-                            detector.delete_comment(comment['id'])
+                            ok = detector.delete_comment(comment_id)
                         else:
-                            detector.mark_as_spam(comment['id'])
+                            ok = detector.mark_as_spam(comment_id)
+                        if ok:
+                            handled.append(comment_id)
+                    results_store.record_actions(handled, 'deleted' if action == '1' else 'marked_spam')
         else:
             print("\nไม่พบความคิดเห็นในวิดีโอนี้")
     except Exception as e:
         print(f"\nเกิดข้อผิดพลาด: {str(e)}")
+    finally:
+        results_store.close()
+        if comments is not None:
+            comments.close()
 
-def test_url_only():
-    """โหมดทดสอบด้วย URL อย่างเดียว"""
-    url = input("\nใส่ URL ของวิดีโอ YouTube: ")
+def show_scan_history():
+    """แสดงสถิติจากผลการสแกนที่บันทึกไว้"""
+    from results_store import ResultsStore
+    results_store = ResultsStore()
+    try:
+        channel_id = input("\nChannel ID (กด Enter = ทุก channel): ").strip() or None
+        days = input("ย้อนหลังกี่วัน (กด Enter = 7): ").strip() or "7"
+        since = time.time() - int(days) * 86400
+        
+        summary = results_store.summary(channel_id=channel_id, since=since)
+        print(f"\n📊 สถิติย้อนหลัง {days} วัน:")
+        print(f"💬 ความคิดเห็นที่ตรวจแล้ว: {summary['comments']}")
+        print(f"🚫 จำนวน Spam: {summary['spam']}")
+        print(f"🤖 ใช้ AI ตรวจ: {summary['llm_calls']} ครั้ง")
+        print(f"🧹 จัดการแล้ว: {summary['actions']}")
+        
+        for day, total, spam in results_store.spam_per_day(channel_id=channel_id, since=since):
+            print(f"   {day}: {spam}/{total}")
+        
+        top_authors = results_store.top_spam_authors(channel_id=channel_id, since=since)
+        if top_authors:
+            print("\n👤 ผู้เขียนที่โพสต์ Spam มากที่สุด:")
+            for author_id, name, count in top_authors:
+                print(f"   {name} ({author_id}): {count}")
+        
+        if input("\nส่งออกเป็นไฟล์ CSV (y/n)? ").lower() == 'y':
+            count = results_store.export("scan_results.csv.gz", since=since)
+            print(f"ส่งออก {count} รายการไปที่ scan_results.csv.gz")
+    except ValueError:
+        print("\nกรุณาใส่จำนวนวันเป็นตัวเลข")
+    finally:
+        results_store.close()
+
+def test_url_only(fixture_dir=None):
+    """โหมดทดสอบด้วย URL อย่างเดียว (ไม่ใช้ API key)
+
+    fixture_dir: โฟลเดอร์ HTML/JSON ที่บันทึกไว้ สำหรับทดสอบแบบ offline
+    """
+    from spam_detector import YouTubeSpamDetector
+    from scraper import ScrapeEngine, FixtureTransport
+    
+    url = input("\nใส่ URL ของวิดีโอ YouTube: ") if fixture_dir is None else None
     try:
         # สร้าง detector ในโหมดทดสอบ
         detector = YouTubeSpamDetector(None, test_mode=True)
         
-        # ดึงข้อมูลจากหน้าเว็บ
+        # ดึงความคิดเห็นทั้งหมดจากหน้าเว็บ (ตาม continuation token ทุกหน้า)
         print("\nกำลังดึงข้อมูลความคิดเห็น...")
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # ดึง comments จากหน้าเว็บ
-        html = response.text
-        soup = BeautifulSoup(html, 'html.parser')
+        transport = FixtureTransport(fixture_dir) if fixture_dir else None
+        comments = ScrapeEngine(transport).scrape(url)
         
-        # ค้นหา script ที่มี comments data
-        pattern = r'ytInitialData = ({.*?});'
-        script = re.search(pattern, html)
-        if script:
-            data = json.loads(script.group(1))
-            comments = []
+        # วิเคราะห์ comments ที่พบ
+        if comments:
+            total_comments = len(comments)
+            spam_comments = []
             
-            # ดึง comments จาก ytInitialData
-            try:
-                items = data['contents']['twoColumnWatchNextResults']['results']['results']['contents']
-                for item in items:
-                    if 'commentThreadRenderer' in str(item):
-                        comment_thread = item['commentThreadRenderer']
-                        comment = comment_thread['comment']['commentRenderer']['contentText']['runs'][0]['text']
-                        comments.append(comment)
-            except (KeyError, IndexError):
-                pass
+            print(f"\nกำลังวิเคราะห์ความคิดเห็นทั้งหมด {total_comments} ข้อความ...")
+            print("-" * 60)
             
-            # วิเคราะห์ comments ที่พบ
-            if comments:
-                total_comments = len(comments)
-                spam_comments = []
-                
-                print(f"\nกำลังวิเคราะห์ความคิดเห็นทั้งหมด {total_comments} ข้อความ...")
-                print("-" * 60)
-                
-                for i, comment in enumerate(comments, 1):
-                    print(f"\nกำลังตรวจสอบความคิดเห็นที่ {i}/{total_comments}")
-                    if detector.is_spam(comment):
-                        spam_comments.append(comment)
-                        print("🚫 พบ Spam!")
-                    else:
-                        print("✅ ไม่ใช่ Spam")
-                
-                spam_count = len(spam_comments)
-                spam_percentage = (spam_count / total_comments * 100) if total_comments > 0 else 0
-                
-                print(f"\n📊 ผลการวิเคราะห์:")
-                print(f"💬 จำนวนความคิดเห็นทั้งหมด: {total_comments}")
-                print(f"🚫 จำนวน Spam: {spam_count}")
-                print(f"📈 เปอร์เซ็นต์ Spam: {spam_percentage:.1f}%")
-                
-                if spam_comments:
-                    print("\n🚫 ความคิดเห็นที่เป็น Spam ทั้งหมด:")
-                    for i, comment in enumerate(spam_comments, 1):
-                        print(f"\n{i}. {comment}")
-            else:
-                print("\nไม่พบความคิดเห็นในวิดีโอนี้")
-                
+            for i, comment in enumerate(comments, 1):
+                print(f"\nกำลังตรวจสอบความคิดเห็นที่ {i}/{total_comments}")
+                if detector.is_spam(comment['text'], comment['author_channel_id']):
+                    spam_comments.append(comment)
+                    print("🚫 พบ Spam!")
+                else:
+                    print("✅ ไม่ใช่ Spam")
+            
+            spam_count = len(spam_comments)
+            spam_percentage = (spam_count / total_comments * 100) if total_comments > 0 else 0
+            
+            print(f"\n📊 ผลการวิเคราะห์:")
+            print(f"💬 จำนวนความคิดเห็นทั้งหมด: {total_comments}")
+            print(f"🚫 จำนวน Spam: {spam_count}")
+            print(f"📈 เปอร์เซ็นต์ Spam: {spam_percentage:.1f}%")
+            
+            if spam_comments:
+                print("\n🚫 ความคิดเห็นที่เป็น Spam ทั้งหมด:")
+                for i, comment in enumerate(spam_comments, 1):
+                    print(f"\n{i}. โดย: {comment['author']}")
+                    print(f"   ข้อความ: {comment['text']}")
         else:
-            print("\nไม่สามารถดึงข้อมูลความคิดเห็นได้")
+            print("\nไม่พบความคิดเห็นในวิดีโอนี้")
             
     except Exception as e:
         print(f"\nเกิดข้อผิดพลาด: {str(e)}")
@@ -224,7 +295,33 @@ def main():
     print("\n=== YouTube Comment Spam Analyzer ===")
     
     # โหลดและตั้งค่า
+    from config_manager import ConfigManager
+    import metrics
+    import tracing
+    import scan_log
+    import cassette
+    
     config_manager = ConfigManager()
+    metrics.configure(config_manager.config.get("metrics"))
+    tracing.configure(config_manager.config.get("tracing"))
+    
+    # บันทึก/เล่นซ้ำ request ของ YouTube และ AI (YTSPAM_CASSETTE=record|replay ใช้แทนการตั้งค่าได้)
+    cassette_settings = dict(config_manager.config.get("cassette") or {})
+    if os.getenv("YTSPAM_CASSETTE"):
+        cassette_settings["mode"] = os.getenv("YTSPAM_CASSETTE")
+    cassette.configure(cassette_settings)
+    
+    # โหมดแสดงผลของ detector (human/quiet/json) กำหนดผ่าน env ได้สำหรับงาน batch
+    log_settings = dict(config_manager.config.get("logging") or {})
+    if os.getenv("YTSPAM_LOG_MODE"):
+        log_settings["mode"] = os.getenv("YTSPAM_LOG_MODE")
+    scan_log.configure(log_settings)
+    
+    # เวลา cold start (import + โหลดการตั้งค่า) ก่อนถึงเมนูแรก
+    startup_seconds = time.perf_counter() - _STARTED
+    metrics.registry.observe("startup_seconds", startup_seconds)
+    scan_log.get_logger("cli").info("startup", f"⏱️ เริ่มต้นโปรแกรมใช้เวลา {startup_seconds * 1000:.1f} ms",
+                                    startup_ms=round(startup_seconds * 1000, 1))
     
     print("1. ใช้งานระบบเต็มรูปแบบ")
     print("2. ทดสอบตรวจจับ Spam (ไม่ต้องใช้ API key)")
@@ -239,20 +336,27 @@ def main():
         
         config = {
             "youtube_api_key": youtube_api,
-            "ai_provider": ai_config
+            "ai_provider": ai_config,
+            "ai_provider_pool": config_manager.get_provider_pool(),
+            **config_manager.get_detector_settings()
         }
+        # ตอน record/replay ให้ store ที่เรียนรู้ระหว่างสแกนเริ่มจากสถานะที่บันทึกไว้ใน cassette
+        config = cassette.isolate_stores(config)
         
         try:
-            detector = YouTubeSpamDetector(config)
+            from spam_detector import YouTubeSpamDetector
+            with metrics.registry.timer("detector_init_seconds"):
+                detector = YouTubeSpamDetector(config)
             print("\nเริ่มต้นระบบสำเร็จ!")
             
             while True:
                 print("\n=== เมนูหลัก ===")
                 print("1. วิเคราะห์ความคิดเห็นจาก URL")
                 print("2. ทดสอบข้อความ")
-                print("3. ออกจากโปรแกรม")
+                print("3. ดูสถิติจากผลการสแกน")
+                print("4. ออกจากโปรแกรม")
                 
-                choice = input("\nเลือกเมนู (1-3): ")
+                choice = input("\nเลือกเมนู (1-4): ")
                 
                 if choice == '1':
                     url = input("\nใส่ URL ของวิดีโอ YouTube: ")
@@ -260,10 +364,12 @@ def main():
                 elif choice == '2':
                     test_single_comment(detector)
                 elif choice == '3':
+                    show_scan_history()
+                elif choice == '4':
                     print("\nขอบคุณที่ใช้บริการ!")
                     break
                 else:
-                    print("\nกรุณาเลือกเมนู 1-3")
+                    print("\nกรุณาเลือกเมนู 1-4")
                     
         except Exception as e:
             print(f"\nเกิดข้อผิดพลาด: {str(e)}")
@@ -272,7 +378,9 @@ def main():
     elif mode == '2':
         # โหมดทดสอบ
         try:
-            detector = YouTubeSpamDetector(None, test_mode=True)
+            from spam_detector import YouTubeSpamDetector
+            with metrics.registry.timer("detector_init_seconds"):
+                detector = YouTubeSpamDetector(None, test_mode=True)
             print("\nเริ่มต้นระบบทดสอบสำเร็จ!")
             
             while True:
@@ -294,7 +402,8 @@ def main():
             print(f"\nเกิดข้อผิดพลาด: {str(e)}")
     
     elif mode == '3':
-        test_url_only()
+        # YTSPAM_FIXTURE_DIR=<โฟลเดอร์> อ่านหน้า watch/continuation ที่บันทึกไว้แทนการต่อ YouTube
+        test_url_only(os.getenv("YTSPAM_FIXTURE_DIR"))
     
     else:
         print("\nกรุณาเลือกโหมด 1-3")
@@ -0,0 +1,220 @@
+import atexit
+import bisect
+import json
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _NullTimer:
+    """timer ที่ไม่ทำอะไร ใช้เมื่อปิด metrics"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class Metrics:
+    """ตัวเก็บ counter และ histogram สำหรับวัด throughput/latency ของการสแกน
+
+    ปิดอยู่เป็นค่าเริ่มต้น ทุกเมธอดคืนค่าทันทีเมื่อ enabled เป็น False
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @staticmethod
+    def _key(name, labels):
+        if not labels:
+            return (name, ())
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, value=1, labels=None):
+        """เพิ่มค่า counter"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=None):
+        """บันทึกค่าลง histogram (หน่วยวินาที)"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": [0] * len(DEFAULT_BUCKETS), "count": 0, "sum": 0.0}
+            index = bisect.bisect_left(DEFAULT_BUCKETS, seconds)
+            if index < len(DEFAULT_BUCKETS):
+                hist["buckets"][index] += 1
+            hist["count"] += 1
+            hist["sum"] += seconds
+
+    def timer(self, name, labels=None):
+        """context manager จับเวลาแล้วบันทึกลง histogram"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def counter_value(self, name, labels=None):
+        return self.counters.get(self._key(name, labels), 0)
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        items = list(labels) + (list(extra.items()) if extra else [])
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+    def render_prometheus(self):
+        """ส่งออกในรูปแบบ Prometheus text format"""
+        lines = []
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {k: {"buckets": list(v["buckets"]), "count": v["count"], "sum": v["sum"]}
+                          for k, v in self.histograms.items()}
+
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE ytspam_{name} counter")
+                seen.add(name)
+            lines.append(f"ytspam_{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), hist in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE ytspam_{name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"ytspam_{name}_bucket{self._format_labels(labels, {'le': bound})} {cumulative}")
+            lines.append(f"ytspam_{name}_bucket{self._format_labels(labels, {'le': '+Inf'})} {hist['count']}")
+            lines.append(f"ytspam_{name}_sum{self._format_labels(labels)} {hist['sum']:.6f}")
+            lines.append(f"ytspam_{name}_count{self._format_labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """สรุป metrics เป็น dict (ใช้ dump เป็น JSON)"""
+        def label_str(name, labels):
+            return name + self._format_labels(labels)
+
+        with self._lock:
+            result = {
+                "uptime_seconds": round(time.time() - self.started, 3),
+                "counters": {label_str(n, l): v for (n, l), v in sorted(self.counters.items())},
+                "histograms": {
+                    label_str(n, l): {
+                        "count": h["count"],
+                        "sum_seconds": round(h["sum"], 6),
+                        "avg_ms": round(h["sum"] / h["count"] * 1000, 3) if h["count"] else 0.0
+                    }
+                    for (n, l), h in sorted(self.histograms.items())
+                }
+            }
+
+        # ค่าที่คำนวณเพิ่ม
+        fetched = self.counter_value("comments_fetched_total")
+        fetch_hist = self.histograms.get(("youtube_fetch_seconds", ()))
+        if fetched and fetch_hist and fetch_hist["sum"]:
+            result["comments_fetched_per_sec"] = round(fetched / fetch_hist["sum"], 2)
+        ratios = {}
+        for (name, labels), value in self.counters.items():
+            if name == "cache_lookups_total":
+                labels = dict(labels)
+                entry = ratios.setdefault(labels.get("cache"), {"hit": 0, "total": 0})
+                entry["total"] += value
+                if labels.get("result") == "hit":
+                    entry["hit"] += value
+        if ratios:
+            result["cache_hit_ratio"] = {
+                cache: round(v["hit"] / v["total"], 4) if v["total"] else 0.0 for cache, v in ratios.items()
+            }
+        return result
+
+    def dump_json(self, path):
+        """บันทึก metrics ลงไฟล์ JSON"""
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"ไม่สามารถบันทึก metrics ได้: {e}")
+
+    def start_http_server(self, port=9464, host="127.0.0.1"):
+        """เปิด endpoint /metrics (Prometheus) และ /metrics.json บน localhost"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(metrics.to_dict(), ensure_ascii=False).encode('utf-8')
+                    content_type = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = metrics.render_prometheus().encode('utf-8')
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self._server.server_address
+
+
+# registry กลางที่ทุกโมดูลใช้ร่วมกัน
+registry = Metrics()
+
+def configure(settings):
+    """เปิดใช้ metrics ตามการตั้งค่า
+
+    settings: {"enabled": bool, "port": int หรือ None, "json_path": str หรือ None}
+    """
+    if not settings or not settings.get("enabled"):
+        return registry
+    registry.enabled = True
+    if settings.get("port"):
+        try:
+            host, port = registry.start_http_server(settings["port"], settings.get("host", "127.0.0.1"))
+            print(f"📈 Metrics: http://{host}:{port}/metrics")
+        except OSError as e:
+            print(f"ไม่สามารถเปิด metrics endpoint ได้: {e}")
+    if settings.get("json_path"):
+        atexit.register(registry.dump_json, settings["json_path"])
+    return registry
@@ -0,0 +1,135 @@
+import json
+import os
+import pickle
+import re
+
+from confusables import rewrite_pattern
+
+SNAPSHOT_VERSION = 4
+
+# น้ำหนักคะแนนตามประเภท pattern
+PATTERN_WEIGHTS = {
+    "gambling_site_name": 3,
+    "gambling_keywords": 2
+}
+
+# cache ภายใน process: path -> (mtime_ns, size, patterns, PatternSet)
+_cache = {}
+
+class PatternSet:
+    """patterns ที่ตรวจสอบแล้ว compile เมื่อใช้งานครั้งแรก (ครั้งเดียวต่อ process)
+
+    re ของ Python serialize regex ที่ compile แล้วไม่ได้ (pickle จะ compile ใหม่ตอนโหลด)
+    จึงเลื่อนการ compile ไปจนกว่าจะตรวจความคิดเห็นแรกจริง
+    regex ทุกตัวทำงานกับข้อความที่ผ่าน confusables.skeleton() แล้ว
+    """
+
+    def __init__(self, entries):
+        # entries: list ของ (pattern ใน skeleton, pattern ต้นฉบับ, คะแนน) ที่ compile ได้แน่นอนแล้ว
+        self.entries = entries
+        self._compiled = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        if self._compiled is None:
+            self._compiled = [(re.compile(pattern), source, weight) for pattern, source, weight in self.entries]
+        return iter(self._compiled)
+
+
+def snapshot_path(db_file):
+    base, _ = os.path.splitext(db_file)
+    return base + ".snapshot.pickle"
+
+def _scoped(pattern):
+    """ย้าย flag (?i) ที่ต้นของ pattern เข้าไปใน group เพื่อนำไปต่อกับ pattern อื่นได้"""
+    if pattern.startswith('(?i)'):
+        return '(?i:' + pattern[4:] + ')'
+    return '(?:' + pattern + ')'
+
+def compile_patterns(patterns):
+    """ตรวจสอบ patterns เขียนใหม่ให้อยู่ใน skeleton แล้วคืนค่า PatternSet
+
+    pattern ที่ compile ไม่ได้จะถูกข้าม (เดิม re.search ก็ error แล้วข้ามทุกครั้ง)
+    pattern ที่รวมเป็น regex เดียว:
+    - pattern ที่กลายเป็นตัวเดียวกันหลังแปลง รวมคะแนนไว้ (คะแนนเท่าตอนตรวจแยกกัน)
+    - pattern ที่มี type และ group เดียวกัน (เช่น ชื่อเว็บแบบคำไทย/อังกฤษ กับแบบ homoglyph)
+      ต่อเป็น A|B ใช้คะแนนรวมของทั้งกลุ่ม ตรงรูปแบบใดรูปแบบหนึ่งก็ได้คะแนนเต็ม
+    """
+    merged = {}
+    for pattern_obj in patterns:
+        try:
+            re.compile(pattern_obj['pattern'])
+            rewritten = rewrite_pattern(pattern_obj['pattern'])
+            re.compile(rewritten)
+        except (re.error, TypeError, KeyError):
+            continue
+        weight = PATTERN_WEIGHTS.get(pattern_obj.get('type'), 1)
+        group = pattern_obj.get('group')
+        key = (pattern_obj.get('type'), group) if group else rewritten
+        if key in merged:
+            if rewritten not in merged[key][0]:
+                merged[key][0].append(rewritten)
+            merged[key][2] += weight
+        else:
+            merged[key] = [[rewritten], pattern_obj['pattern'], weight]
+
+    entries = []
+    for alternatives, source, weight in merged.values():
+        pattern = alternatives[0] if len(alternatives) == 1 else '|'.join(_scoped(p) for p in alternatives)
+        entries.append((pattern, source, weight))
+    return PatternSet(entries)
+
+def _stat(db_file):
+    st = os.stat(db_file)
+    return st.st_mtime_ns, st.st_size
+
+def load(db_file):
+    """โหลด patterns จาก cache ใน process -> snapshot pickle -> JSON ตามลำดับ
+
+    snapshot ใช้ได้เมื่อ mtime และขนาดของไฟล์ JSON ตรงกับตอนสร้าง
+    คืนค่า (patterns, PatternSet)
+    """
+    key = os.path.abspath(db_file)
+    mtime_ns, size = _stat(db_file)
+
+    cached = _cache.get(key)
+    if cached and cached[0] == mtime_ns and cached[1] == size:
+        return list(cached[2]), cached[3]
+
+    try:
+        with open(snapshot_path(db_file), 'rb') as f:
+            snapshot = pickle.load(f)
+        if (snapshot.get("version") == SNAPSHOT_VERSION
+                and snapshot.get("source_mtime_ns") == mtime_ns
+                and snapshot.get("source_size") == size):
+            patterns, pattern_set = snapshot["patterns"], PatternSet(snapshot["entries"])
+            _cache[key] = (mtime_ns, size, patterns, pattern_set)
+            return list(patterns), pattern_set
+    except Exception:
+        pass
+
+    with open(db_file, 'r', encoding='utf-8') as f:
+        patterns = json.load(f)
+    pattern_set = compile_patterns(patterns)
+    store(db_file, patterns, pattern_set)
+    return list(patterns), pattern_set
+
+def store(db_file, patterns, pattern_set):
+    """บันทึก snapshot ให้ตรงกับไฟล์ JSON ปัจจุบัน"""
+    mtime_ns, size = _stat(db_file)
+    _cache[os.path.abspath(db_file)] = (mtime_ns, size, list(patterns), pattern_set)
+    try:
+        tmp_path = snapshot_path(db_file) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                "version": SNAPSHOT_VERSION,
+                "source_mtime_ns": mtime_ns,
+                "source_size": size,
+                "patterns": patterns,
+                "entries": pattern_set.entries
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path(db_file))
+    except OSError:
+        pass
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+
+from metrics import registry as metrics
+from scan_log import get_logger
+
+log = get_logger("provider_pool")
+
+class LatencyTracker:
+    """เก็บ latency ล่าสุดของ provider เพื่อคำนวณ p95"""
+
+    def __init__(self, window=100):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct):
+        """คืนค่า percentile ของ latency หรือ None ถ้ายังไม่มีข้อมูล"""
+        with self._lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class ProviderPool:
+    """กลุ่ม AI provider เรียงตามลำดับความสำคัญ พร้อม hedged request และ failover
+
+    - ส่ง request ไปยัง provider ตัวแรกก่อน
+    - ถ้าช้ากว่า p95 ของตัวเอง ส่ง request สำรอง (hedge) ไปยังตัวถัดไป คำตอบแรกที่ใช้ได้ชนะ
+    - ถ้า provider error ข้ามไปตัวถัดไปทันที
+    """
+
+    def __init__(self, providers, hedge_delay=3.0, min_samples=10):
+        """
+        providers: list ของ ai_config เรียงตามลำดับ (ตัวแรกคือ primary)
+        hedge_delay: วินาทีที่รอก่อน hedge เมื่อยังมี latency ไม่พอคำนวณ p95
+        min_samples: จำนวน latency ขั้นต่ำก่อนใช้ p95 จริง
+        """
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.latency = {p["name"]: LatencyTracker() for p in self.providers}
+        self.counters = {p["name"]: {"calls": 0, "wins": 0, "errors": 0, "hedged": 0} for p in self.providers}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=max(2, len(self.providers) * 2))
+        return self._executor
+
+    def _hedge_after(self, provider):
+        """เวลาที่ยอมรอ provider นี้ก่อนส่ง hedge"""
+        tracker = self.latency[provider["name"]]
+        if len(tracker) >= self.min_samples:
+            return tracker.percentile(95)
+        return self.hedge_delay
+
+    def _timed_call(self, provider, call_fn):
+        name = provider["name"]
+        with self._lock:
+            self.counters[name]["calls"] += 1
+        start = time.perf_counter()
+        try:
+            result = call_fn(provider)
+        except Exception as e:
+            # error ที่ไม่ใช่ HTTP (import, สร้าง request, อ่านคำตอบ) ต้องเห็นได้ ไม่ใช่กลายเป็น pattern_fallback เงียบๆ
+            metrics.inc("llm_errors_total", labels={"provider": name})
+            log.error("llm_call_error", f"❌ เกิดข้อผิดพลาด ({name.upper()}): {type(e).__name__}: {e}",
+                      provider=name, error=f"{type(e).__name__}: {e}")
+            result = None
+        if result is None:
+            with self._lock:
+                self.counters[name]["errors"] += 1
+        else:
+            self.latency[name].record(time.perf_counter() - start)
+        return result
+
+    def execute(self, call_fn):
+        """เรียก call_fn(ai_config) ผ่าน pool
+
+        call_fn ต้องคืนค่า None เมื่อ provider error หรือคำตอบใช้ไม่ได้
+        คืนค่า (ผลลัพธ์, ai_config ที่ตอบ) หรือ (None, None) ถ้าทุกตัวล้มเหลว
+        """
+        if not self.providers:
+            return None, None
+
+        # provider เดียวไม่ต้องใช้ thread
+        if len(self.providers) == 1:
+            provider = self.providers[0]
+            result = self._timed_call(provider, call_fn)
+            if result is not None:
+                with self._lock:
+                    self.counters[provider["name"]]["wins"] += 1
+                return result, provider
+            return None, None
+
+        from concurrent.futures import wait, FIRST_COMPLETED
+        executor = self._get_executor()
+        pending = {}
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            provider = self.providers[next_index]
+            next_index += 1
+            pending[executor.submit(self._timed_call, provider, call_fn)] = provider
+            return provider
+
+        last_launched = launch()
+        while pending:
+            timeout = self._hedge_after(last_launched) if next_index < len(self.providers) else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # ช้ากว่า p95 ส่ง hedge ไปยังตัวถัดไป ตัวเดิมยังรันต่อ
+                with self._lock:
+                    self.counters[last_launched["name"]]["hedged"] += 1
+                last_launched = launch()
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                result = future.result()
+                if result is not None:
+                    with self._lock:
+                        self.counters[provider["name"]]["wins"] += 1
+                    return result, provider
+
+            # provider ที่เสร็จแล้ว error ทั้งหมด ข้ามไปตัวถัดไปทันที
+            if next_index < len(self.providers):
+                last_launched = launch()
+
+        return None, None
+
+    def stats(self):
+        """สถิติของแต่ละ provider"""
+        with self._lock:
+            result = {}
+            for provider in self.providers:
+                name = provider["name"]
+                tracker = self.latency[name]
+                p95 = tracker.percentile(95)
+                result[name] = dict(self.counters[name])
+                result[name]["p95_latency"] = round(p95, 3) if p95 is not None else None
+            return result
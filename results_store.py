@@ -0,0 +1,185 @@
+import csv
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    comment_id       TEXT PRIMARY KEY,
+    video_id         TEXT,
+    channel_id       TEXT,
+    author_id        TEXT,
+    author_name      TEXT,
+    text_hash        TEXT,
+    pattern_score    INTEGER,
+    matched_patterns TEXT,
+    llm_score        INTEGER,
+    llm_verdict      TEXT,
+    is_spam          INTEGER,
+    decided_by       TEXT,
+    action           TEXT,
+    pattern_ms       REAL,
+    llm_ms           REAL,
+    total_ms         REAL,
+    published_at     TEXT,
+    judged_at        REAL
+);
+CREATE INDEX IF NOT EXISTS idx_verdicts_video ON verdicts(video_id, judged_at);
+CREATE INDEX IF NOT EXISTS idx_verdicts_channel ON verdicts(channel_id, judged_at);
+CREATE INDEX IF NOT EXISTS idx_verdicts_author ON verdicts(author_id, judged_at);
+CREATE INDEX IF NOT EXISTS idx_verdicts_time ON verdicts(judged_at);
+"""
+
+COLUMNS = [
+    "comment_id", "video_id", "channel_id", "author_id", "author_name", "text_hash",
+    "pattern_score", "matched_patterns", "llm_score", "llm_verdict", "is_spam",
+    "decided_by", "action", "pattern_ms", "llm_ms", "total_ms", "published_at", "judged_at"
+]
+
+def text_hash(text):
+    """hash สั้นของข้อความ (ไม่เก็บข้อความเต็มในฐานข้อมูล)"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultsStore:
+    """ฐานข้อมูล SQLite เก็บผลการตัดสินและประวัติการจัดการความคิดเห็น
+
+    เขียนเป็นชุดใน transaction เดียว (batch_size แถวต่อครั้ง)
+    """
+
+    def __init__(self, db_file="scan_results.db", batch_size=200):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.pending = []
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def add(self, comment, video_id, result):
+        """เพิ่มผลการตัดสินของความคิดเห็นหนึ่งรายการ (บันทึกจริงเมื่อครบ batch)
+
+        comment: dict จาก get_video_comments
+        result: detector.last_result
+        """
+        self.pending.append((
+            comment['id'],
+            video_id,
+            comment.get('channel_id'),
+            comment.get('author_channel_id'),
+            comment.get('author'),
+            text_hash(comment['text']),
+            result.get('pattern_score'),
+            json.dumps(result.get('matched_patterns', []), ensure_ascii=False),
+            result.get('llm_score'),
+            result.get('llm_verdict'),
+            int(bool(result.get('is_spam'))),
+            result.get('decided_by'),
+            None,
+            round(result.get('pattern_ms', 0.0), 3),
+            round(result.get('llm_ms', 0.0), 3),
+            round(result.get('total_ms', 0.0), 3),
+            comment.get('published_at'),
+            time.time()
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """บันทึกรายการที่ค้างอยู่ใน transaction เดียว"""
+        if not self.pending:
+            return
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        # สแกนซ้ำอัพเดทผลตัดสินแต่คง action เดิมไว้ (INSERT OR REPLACE จะลบแถวเดิมและประวัติการจัดการทิ้ง)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS if column not in ("comment_id", "action"))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO verdicts ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(comment_id) DO UPDATE SET {updates}",
+                self.pending
+            )
+        self.pending = []
+
+    def record_actions(self, comment_ids, action):
+        """บันทึกการจัดการความคิดเห็น (deleted / marked_spam)"""
+        self.flush()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE verdicts SET action = ? WHERE comment_id = ?",
+                [(action, comment_id) for comment_id in comment_ids]
+            )
+
+    def summary(self, channel_id=None, video_id=None, author_id=None, since=None):
+        """สรุปจำนวนความคิดเห็น/spam ตามเงื่อนไข
+
+        since: timestamp (วินาที) เริ่มต้น เช่น time.time() - 7 * 86400
+        """
+        self.flush()
+        where, params = self._filters(channel_id, video_id, author_id, since)
+        row = self.conn.execute(
+            f"""SELECT COUNT(*), COALESCE(SUM(is_spam), 0),
+                       COALESCE(SUM(llm_score IS NOT NULL), 0),
+                       COALESCE(SUM(action IS NOT NULL), 0),
+                       AVG(total_ms)
+                FROM verdicts {where}""",
+            params
+        ).fetchone()
+        return {
+            "comments": row[0],
+            "spam": row[1],
+            "llm_calls": row[2],
+            "actions": row[3],
+            "avg_ms": round(row[4] or 0.0, 3)
+        }
+
+    def spam_per_day(self, channel_id=None, video_id=None, since=None):
+        """จำนวน spam รายวัน [(วันที่, จำนวนทั้งหมด, จำนวน spam)]"""
+        self.flush()
+        where, params = self._filters(channel_id, video_id, None, since)
+        return self.conn.execute(
+            f"""SELECT date(judged_at, 'unixepoch', 'localtime') AS day, COUNT(*), SUM(is_spam)
+                FROM verdicts {where} GROUP BY day ORDER BY day""",
+            params
+        ).fetchall()
+
+    def top_spam_authors(self, limit=10, channel_id=None, since=None):
+        """ผู้เขียนที่โพสต์ spam มากที่สุด [(author_id, ชื่อ, จำนวน spam)]"""
+        self.flush()
+        where, params = self._filters(channel_id, None, None, since)
+        where = f"{where} AND is_spam = 1" if where else "WHERE is_spam = 1"
+        return self.conn.execute(
+            f"""SELECT author_id, MAX(author_name), COUNT(*) AS spam
+                FROM verdicts {where} GROUP BY author_id ORDER BY spam DESC LIMIT ?""",
+            params + [limit]
+        ).fetchall()
+
+    def _filters(self, channel_id, video_id, author_id, since):
+        clauses, params = [], []
+        for column, value in (("channel_id", channel_id), ("video_id", video_id), ("author_id", author_id)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("judged_at >= ?")
+            params.append(since)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def export(self, path, since=None):
+        """ส่งออกผลทั้งหมดเป็น CSV บีบอัด gzip คืนค่าจำนวนแถว"""
+        self.flush()
+        where, params = self._filters(None, None, None, since)
+        cursor = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM verdicts {where} ORDER BY judged_at", params)
+        count = 0
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        return count
+
+    def close(self):
+        self.flush()
+        self.conn.close()
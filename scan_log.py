@@ -0,0 +1,93 @@
+import json
+import logging
+import sys
+
+ROOT_LOGGER = "ytspam"
+
+class JsonLinesFormatter(logging.Formatter):
+    """แปลง log record เป็น JSON หนึ่งบรรทัด"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage().strip()
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ScanLogger:
+    """logger แบบมีระดับและ field สำหรับข้อความระหว่างสแกน
+
+    ข้อความ (message) ใช้แสดงผลแบบเดิมในโหมด human ส่วน event/fields ใช้ในโหมด json
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def _log(self, level, event, message, fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra={"event": event, "fields": fields})
+
+    def debug(self, event, message, **fields):
+        self._log(logging.DEBUG, event, message, fields)
+
+    def info(self, event, message, **fields):
+        self._log(logging.INFO, event, message, fields)
+
+    def warning(self, event, message, **fields):
+        self._log(logging.WARNING, event, message, fields)
+
+    def error(self, event, message, **fields):
+        self._log(logging.ERROR, event, message, fields)
+
+
+def get_logger(name):
+    return ScanLogger(name)
+
+def configure(settings=None):
+    """ตั้งค่าการแสดงผลของ detector
+
+    settings: {"mode": "human" | "quiet" | "json", "path": ไฟล์ปลายทางของโหมด json, "buffer_lines": int}
+    - human: แสดงข้อความแบบเดิมบน stdout
+    - quiet: แสดงเฉพาะคำเตือนและข้อผิดพลาด
+    - json:  เขียน JSON lines แบบ buffer (ไปยังไฟล์หรือ stdout)
+    """
+    settings = settings or {}
+    mode = settings.get("mode", "human")
+    root = logging.getLogger(ROOT_LOGGER)
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    if mode == "json":
+        from logging.handlers import MemoryHandler
+        path = settings.get("path")
+        stream = open(path, 'a', encoding='utf-8') if path else sys.stdout
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonLinesFormatter())
+        # เขียนออกเป็นชุด ลดจำนวนครั้งของ I/O (logging.shutdown ตอนจบโปรแกรมจะ flush ที่เหลือ)
+        handler = MemoryHandler(
+            settings.get("buffer_lines", 1000), flushLevel=logging.ERROR, target=target
+        )
+        root.setLevel(logging.getLevelName(settings.get("level", "INFO").upper()))
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.setLevel(logging.WARNING if mode == "quiet" else logging.INFO)
+
+    root.addHandler(handler)
+    return root
+
+def flush():
+    """flush buffer ของโหมด json"""
+    for handler in logging.getLogger(ROOT_LOGGER).handlers:
+        handler.flush()
+
+
+# ค่าเริ่มต้นเหมือนเดิม: แสดงข้อความบน stdout
+configure()
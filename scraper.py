@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+INITIAL_DATA_MARKERS = ('var ytInitialData = ', 'window["ytInitialData"] = ', 'ytInitialData = ')
+NEXT_URL = "https://www.youtube.com/youtubei/v1/next"
+
+_decoder = json.JSONDecoder()
+
+def _decode_json_at(text, marker):
+    """decode JSON ที่อยู่ถัดจาก marker โดยไม่ parse HTML ทั้งหน้า"""
+    index = text.find(marker)
+    if index == -1:
+        return None
+    start = index + len(marker)
+    while start < len(text) and text[start] in ' \t\r\n':
+        start += 1
+    try:
+        value, _ = _decoder.raw_decode(text, start)
+        return value
+    except ValueError:
+        return None
+
+def extract_initial_data(html):
+    """ดึง ytInitialData จากหน้า watch"""
+    for marker in INITIAL_DATA_MARKERS:
+        data = _decode_json_at(html, marker)
+        if isinstance(data, dict):
+            return data
+    return None
+
+def extract_innertube_config(html):
+    """ดึง API key และ context ของ InnerTube สำหรับขอ continuation"""
+    return {
+        "api_key": _decode_json_at(html, '"INNERTUBE_API_KEY":'),
+        "context": _decode_json_at(html, '"INNERTUBE_CONTEXT":')
+    }
+
+def _runs_text(node):
+    """รวมข้อความทุก run (ไม่ใช่แค่ run แรก)"""
+    if not node:
+        return ""
+    if "simpleText" in node:
+        return node["simpleText"]
+    return "".join(run.get("text", "") for run in node.get("runs", []))
+
+def _continuation_token(item):
+    """ดึง continuation token จาก continuationItemRenderer"""
+    renderer = item.get("continuationItemRenderer")
+    if not renderer:
+        return None
+    endpoint = renderer.get("continuationEndpoint")
+    if not endpoint:
+        endpoint = renderer.get("button", {}).get("buttonRenderer", {}).get("command", {})
+    return endpoint.get("continuationCommand", {}).get("token")
+
+def find_comment_section_token(data):
+    """หา continuation token แรกของส่วนความคิดเห็นใน ytInitialData"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            section = node.get("itemSectionRenderer")
+            if section and section.get("sectionIdentifier") == "comment-item-section":
+                for item in section.get("contents", []):
+                    token = _continuation_token(item)
+                    if token:
+                        return token
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return None
+
+def fixture_name(token):
+    """ชื่อไฟล์ fixture ของ continuation token"""
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:16] + ".json"
+
+
+class RequestsTransport:
+    """ดึงข้อมูลจาก YouTube จริง (record_dir: บันทึกคำตอบไว้เป็น fixture)"""
+
+    def __init__(self, record_dir=None, timeout=15):
+        import requests
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+            "Accept-Language": "th,en;q=0.8"
+        })
+        self.record_dir = record_dir
+        self.timeout = timeout
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def get_text(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        if self.record_dir:
+            with open(os.path.join(self.record_dir, "watch.html"), 'w', encoding='utf-8') as f:
+                f.write(response.text)
+        return response.text
+
+    def post_json(self, url, payload):
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if self.record_dir and payload.get("continuation"):
+            with open(os.path.join(self.record_dir, fixture_name(payload["continuation"])), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        return data
+
+
+class FixtureTransport:
+    """อ่านข้อมูลจาก fixture ที่บันทึกไว้ (ทดสอบแบบ offline)
+
+    fixture_dir ต้องมี watch.html และไฟล์ <fixture_name(token)> ของแต่ละ continuation
+    """
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def get_text(self, url):
+        with open(os.path.join(self.fixture_dir, "watch.html"), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def post_json(self, url, payload):
+        path = os.path.join(self.fixture_dir, fixture_name(payload["continuation"]))
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class ScrapeEngine:
+    """ดึงความคิดเห็นทั้งหมดจากหน้า watch โดยไม่ใช้ YouTube API
+
+    ตามต่อด้วย continuation token (รวม replies) พร้อมกันไม่เกิน max_workers request
+    """
+
+    def __init__(self, transport=None, max_workers=4, max_comments=5000, include_replies=True):
+        self.transport = transport or RequestsTransport()
+        self.max_workers = max_workers
+        self.max_comments = max_comments
+        self.include_replies = include_replies
+
+    def scrape(self, url):
+        """คืนค่า list ของ comment dict แบบเดียวกับ get_video_comments"""
+        html = self.transport.get_text(url)
+        data = extract_initial_data(html)
+        if data is None:
+            return []
+
+        comments, tokens = self._parse_items(self._initial_items(data), {})
+        first_token = find_comment_section_token(data)
+        if first_token:
+            tokens.insert(0, first_token)
+
+        innertube = extract_innertube_config(html)
+        if not innertube["context"]:
+            return comments[:self.max_comments]
+        return self._follow(comments, tokens, innertube)
+
+    def _initial_items(self, data):
+        # ความคิดเห็นที่ฝังมากับหน้า (หน้าแบบเก่า)
+        try:
+            return data['contents']['twoColumnWatchNextResults']['results']['results']['contents']
+        except (KeyError, TypeError):
+            return []
+
+    def _follow(self, comments, tokens, innertube):
+        seen_tokens = set()
+        seen_ids = {c['id'] for c in comments if c['id']}
+        url = NEXT_URL
+        if innertube["api_key"]:
+            url = f"{NEXT_URL}?key={innertube['api_key']}&prettyPrint=false"
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+
+            def submit_ready():
+                while tokens and len(pending) < self.max_workers and len(comments) < self.max_comments:
+                    token = tokens.pop(0)
+                    if token in seen_tokens:
+                        continue
+                    seen_tokens.add(token)
+                    payload = {"context": innertube["context"], "continuation": token}
+                    pending.add(executor.submit(self.transport.post_json, url, payload))
+
+            submit_ready()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    try:
+                        page = future.result()
+                    except Exception:
+                        continue
+                    page_comments, page_tokens = self._parse_continuation(page)
+                    for comment in page_comments:
+                        if comment['id'] in seen_ids:
+                            continue
+                        seen_ids.add(comment['id'])
+                        comments.append(comment)
+                    tokens.extend(page_tokens)
+                submit_ready()
+
+        return comments[:self.max_comments]
+
+    def _parse_continuation(self, data):
+        """แยกความคิดเห็นและ continuation token จากคำตอบของ /next"""
+        items = []
+        for endpoint in data.get("onResponseReceivedEndpoints", []):
+            action = endpoint.get("reloadContinuationItemsCommand") or endpoint.get("appendContinuationItemsAction") or {}
+            items.extend(action.get("continuationItems", []))
+
+        # หน้าแบบใหม่เก็บเนื้อหาความคิดเห็นไว้ใน frameworkUpdates
+        entities = {}
+        mutations = data.get("frameworkUpdates", {}).get("entityBatchUpdate", {}).get("mutations", [])
+        for mutation in mutations:
+            payload = mutation.get("payload", {}).get("commentEntityPayload")
+            if payload:
+                entities[mutation.get("entityKey")] = payload
+        return self._parse_items(items, entities)
+
+    def _parse_items(self, items, entities):
+        comments, tokens = [], []
+        for item in items:
+            if "commentThreadRenderer" in item:
+                thread = item["commentThreadRenderer"]
+                comment = self._from_renderer(thread.get("comment", {}).get("commentRenderer")) \
+                    or self._from_view_model(thread.get("commentViewModel", {}).get("commentViewModel"), entities)
+                if comment:
+                    comments.append(comment)
+                if self.include_replies:
+                    replies = thread.get("replies", {}).get("commentRepliesRenderer", {})
+                    for reply_item in replies.get("contents", []):
+                        token = _continuation_token(reply_item)
+                        if token:
+                            tokens.append(token)
+            elif "commentRenderer" in item:
+                comment = self._from_renderer(item["commentRenderer"])
+                if comment:
+                    comments.append(comment)
+            elif "commentViewModel" in item:
+                comment = self._from_view_model(item["commentViewModel"], entities)
+                if comment:
+                    comments.append(comment)
+            else:
+                token = _continuation_token(item)
+                if token:
+                    tokens.append(token)
+        return comments, tokens
+
+    @staticmethod
+    def _from_renderer(renderer):
+        if not renderer:
+            return None
+        return {
+            'id': renderer.get('commentId'),
+            'text': _runs_text(renderer.get('contentText')),
+            'author': _runs_text(renderer.get('authorText')),
+            'author_channel_id': renderer.get('authorEndpoint', {}).get('browseEndpoint', {}).get('browseId'),
+            'published_at': _runs_text(renderer.get('publishedTimeText'))
+        }
+
+    @staticmethod
+    def _from_view_model(view_model, entities):
+        if not view_model:
+            return None
+        payload = entities.get(view_model.get("commentKey"))
+        if not payload:
+            return None
+        properties = payload.get("properties", {})
+        author = payload.get("author", {})
+        return {
+            'id': properties.get('commentId') or view_model.get('commentId'),
+            'text': properties.get('content', {}).get('content', ''),
+            'author': author.get('displayName', ''),
+            'author_channel_id': author.get('channelId'),
+            'published_at': properties.get('publishedTime', '')
+        }
@@ -0,0 +1,184 @@
+import json
+import math
+import os
+import re
+import zlib
+from datetime import datetime
+
+from confusables import skeleton
+from scan_log import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # ใช้ inverted index แบบ pure Python แทน
+    np = None
+
+WHITESPACE = re.compile(r'\s+')
+
+log = get_logger("similarity_index")
+
+def normalize(text):
+    """ทำข้อความให้อยู่ในรูปเดียวกันก่อนตัด n-gram (skeleton + ตัวพิมพ์เล็ก + ช่องว่างเดียว)"""
+    return WHITESPACE.sub(' ', skeleton(text).lower()).strip()
+
+
+class SimilarityIndex:
+    """ดัชนีหาข้อความ spam ที่ใกล้เคียงที่สุดจาก spam ที่ AI ยืนยันแล้ว
+
+    - แปลงข้อความเป็นเวกเตอร์ character n-gram แบบ hash (feature hashing) แล้ว normalize
+    - ใช้ matrix ของ NumPy หา cosine similarity ด้วย dot product ครั้งเดียว
+      ถ้าไม่มี NumPy ใช้ inverted index ของ bucket คำนวณเฉพาะข้อความที่มี n-gram ร่วมกัน
+    - จำกัดจำนวนข้อความไว้ที่ max_entries เมื่อเต็มจะเขียนทับข้อความที่เก่าที่สุด
+    """
+
+    def __init__(self, db_file="spam_similarity.json", max_entries=5000, dim=1024,
+                 ngram=3, threshold=0.8, min_length=15):
+        """
+        db_file: ไฟล์เก็บข้อความ spam (เวกเตอร์สร้างใหม่ตอนโหลด)
+        max_entries: จำนวนข้อความสูงสุดในดัชนี
+        dim: จำนวน bucket ของ feature hashing
+        ngram: ความยาว character n-gram
+        threshold: cosine similarity ขั้นต่ำที่ถือว่าเป็น spam เดียวกัน
+        min_length: ความยาวขั้นต่ำของข้อความ (ข้อความสั้นเกินไปใกล้เคียงกันได้ง่าย)
+        """
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.dim = dim
+        self.ngram = ngram
+        self.threshold = threshold
+        self.min_length = min_length
+        self.stats = {"lookups": 0, "hits": 0, "added": 0, "duplicates": 0}
+        self.dirty = False     # มีข้อความใหม่ที่ยังไม่ได้บันทึกลงไฟล์
+        self.load()
+
+    def _reset(self):
+        self.entries = []      # slot -> {"text", "added_date"}
+        self.next_slot = 0     # slot ที่จะเขียนทับเมื่อเต็ม
+        if np is not None:
+            self.matrix = np.zeros((min(256, self.max_entries), self.dim), dtype=np.float32)
+        else:
+            self.vectors = []
+            self.postings = {}
+
+    def load(self):
+        """โหลดข้อความจากไฟล์แล้วสร้างเวกเตอร์ใหม่"""
+        self._reset()
+        try:
+            if os.path.exists(self.db_file):
+                with open(self.db_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for entry in data.get("entries", [])[-self.max_entries:]:
+                    self._insert(entry, self._vectorize(entry["text"]))
+        except Exception as e:
+            log.warning("similarity_load_failed", f"ไม่สามารถโหลดดัชนีความคล้ายได้: {e}", path=self.db_file, error=str(e))
+            self._reset()
+        self.dirty = False
+
+    def save(self):
+        """บันทึกข้อความลงไฟล์ (เรียงจากเก่าไปใหม่) เฉพาะเมื่อมีข้อความใหม่ตั้งแต่บันทึกครั้งก่อน"""
+        if not self.dirty:
+            return
+        ordered = self.entries[self.next_slot:] + self.entries[:self.next_slot]
+        try:
+            with open(self.db_file, 'w', encoding='utf-8') as f:
+                json.dump({"entries": ordered}, f, ensure_ascii=False, indent=2)
+            self.dirty = False
+        except Exception as e:
+            log.warning("similarity_save_failed", f"ไม่สามารถบันทึกดัชนีความคล้ายได้: {e}", path=self.db_file, error=str(e))
+
+    def _vectorize(self, text):
+        """คืนค่าเวกเตอร์แบบ sparse {bucket: น้ำหนัก} ที่ normalize แล้ว หรือ None ถ้าข้อความสั้นเกินไป"""
+        text = normalize(text)
+        if len(text) < self.min_length:
+            return None
+        counts = {}
+        for i in range(len(text) - self.ngram + 1):
+            bucket = zlib.crc32(text[i:i + self.ngram].encode('utf-8')) % self.dim
+            counts[bucket] = counts.get(bucket, 0) + 1
+        norm = math.sqrt(sum(c * c for c in counts.values()))
+        return {bucket: c / norm for bucket, c in counts.items()}
+
+    def _insert(self, entry, vector):
+        if vector is None:
+            return
+        if len(self.entries) < self.max_entries:
+            slot = len(self.entries)
+            self.entries.append(entry)
+        else:
+            slot = self.next_slot
+            self.next_slot = (self.next_slot + 1) % self.max_entries
+            self._remove_vector(slot)
+            self.entries[slot] = entry
+
+        if np is not None:
+            if slot >= len(self.matrix):
+                grown = np.zeros((min(len(self.matrix) * 2, self.max_entries), self.dim), dtype=np.float32)
+                grown[:len(self.matrix)] = self.matrix
+                self.matrix = grown
+            row = self.matrix[slot]
+            row[:] = 0
+            for bucket, weight in vector.items():
+                row[bucket] = weight
+        else:
+            if slot == len(self.vectors):
+                self.vectors.append(vector)
+            else:
+                self.vectors[slot] = vector
+            for bucket in vector:
+                self.postings.setdefault(bucket, set()).add(slot)
+
+    def _remove_vector(self, slot):
+        if np is None:
+            for bucket in self.vectors[slot]:
+                self.postings[bucket].discard(slot)
+
+    def _nearest(self, vector):
+        """คืนค่า (similarity, slot) ของข้อความที่ใกล้ที่สุด"""
+        if not self.entries:
+            return 0.0, None
+        if np is not None:
+            query = np.zeros(self.dim, dtype=np.float32)
+            for bucket, weight in vector.items():
+                query[bucket] = weight
+            scores = self.matrix[:len(self.entries)] @ query
+            slot = int(scores.argmax())
+            return float(scores[slot]), slot
+
+        scores = {}
+        for bucket, weight in vector.items():
+            for slot in self.postings.get(bucket, ()):
+                scores[slot] = scores.get(slot, 0.0) + weight * self.vectors[slot][bucket]
+        if not scores:
+            return 0.0, None
+        slot = max(scores, key=scores.get)
+        return scores[slot], slot
+
+    def query(self, text):
+        """คืนค่า (similarity, ข้อความ spam ที่ตรง) ถ้าเกิน threshold ไม่เช่นนั้น (similarity, None)"""
+        self.stats["lookups"] += 1
+        vector = self._vectorize(text)
+        if vector is None:
+            return 0.0, None
+        similarity, slot = self._nearest(vector)
+        if slot is None or similarity < self.threshold:
+            return similarity, None
+        self.stats["hits"] += 1
+        return similarity, self.entries[slot]["text"]
+
+    def add(self, text):
+        """เพิ่มข้อความ spam ที่ยืนยันแล้ว คืนค่า True ถ้าเพิ่มใหม่ (บันทึกลงไฟล์เมื่อเรียก save())"""
+        vector = self._vectorize(text)
+        if vector is None:
+            return False
+        # ข้อความที่เกือบเหมือนของเดิมไม่ต้องเก็บซ้ำ
+        similarity, slot = self._nearest(vector)
+        if slot is not None and similarity >= 0.98:
+            self.stats["duplicates"] += 1
+            return False
+        self._insert({"text": text, "added_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, vector)
+        self.stats["added"] += 1
+        self.dirty = True
+        return True
+
+    def get_stats(self):
+        return dict(self.stats, entries=len(self.entries), backend="numpy" if np is not None else "inverted_index")
@@ -1,8 +1,23 @@
 import re
-import requests
 import json
 import os
+import time
 from datetime import datetime
+from urllib.parse import urlparse
+from circuit_breaker import CircuitBreaker
+from provider_pool import ProviderPool
+from llm_stream import read_streamed_answer
+from author_reputation import AuthorReputation
+from blocklist import IdentifierBlocklist, extract_identifiers
+from similarity_index import SimilarityIndex
+from metrics import registry as metrics
+from tracing import tracer
+from scan_log import get_logger
+import cassette
+import pattern_snapshot
+from confusables import skeleton
+
+log = get_logger("detector")
 
 class YouTubeSpamDetector:
     def __init__(self, config, test_mode=False):
@@ -11,38 +26,87 @@ class YouTubeSpamDetector:
         test_mode: bool สำหรับโหมดทดสอบ
         """
         self.test_mode = test_mode
+        config = config or {}
+        self.api_key = None
         if not test_mode:
             self.api_key = config["youtube_api_key"]
             if not self.api_key:
                 raise ValueError("กรุณาระบุ YouTube API key")
         
-        # ตั้งค่า AI provider
-        self.ai_config = config["ai_provider"]
-        self.llm_url = self.ai_config["url"]
+        # ตั้งค่า AI provider (โหมดทดสอบที่ไม่มี provider ใช้ pattern score ตัดสินอย่างเดียว)
+        self.ai_config = config.get("ai_provider")
+        self.llm_url = self.ai_config["url"] if self.ai_config else None
+        self.llm_timeout = config.get("llm_timeout", 30)
+        # stream คำตอบและหยุดเมื่อได้คะแนน/ผลวิเคราะห์ (ต้องการเหตุผลด้วยให้ตั้ง llm_need_reason)
+        self.llm_stream = config.get("llm_stream", True)
+        self.llm_need_reason = config.get("llm_need_reason", False)
+        
+        # circuit breaker แยกต่อ provider
+        self.breaker_config = config.get("llm_circuit_breaker", {})
+        self.llm_breakers = {}
+        
+        # provider pool: primary ก่อน ตามด้วย providers อื่นที่ตั้งค่าไว้
+        providers = [self.ai_config] if self.ai_config else []
+        for provider in config.get("ai_provider_pool", []):
+            if not self.ai_config or provider["name"] != self.ai_config["name"]:
+                providers.append(provider)
+        self.provider_pool = ProviderPool(
+            providers,
+            hedge_delay=config.get("llm_hedge_delay", 3.0)
+        )
+        
+        # ประวัติผู้เขียน ใช้ตัดสินเร็วสำหรับคนที่ spam ซ้ำ/คนที่ไม่เคย spam
+        reputation_config = config.get("author_reputation", {})
+        self.author_reputation = AuthorReputation(**reputation_config)
+        # ผู้เขียนที่ไม่เคย spam ไม่ต้องใช้ AI ถ้า pattern score ไม่เกินค่านี้
+        self.trusted_author_max_score = config.get("trusted_author_max_score", 2)
+        
+        # งบการเรียก AI ต่อการสแกนหนึ่งครั้ง (ใช้กับ EscalationScheduler)
+        self.llm_budget = config.get("llm_budget") or {}
+        
+        # blocklist ของ URL/domain/Line ID/@handle จาก spam ที่ AI ยืนยันแล้ว
+        self.identifier_blocklist = IdentifierBlocklist(**config.get("identifier_blocklist", {}))
+        
+        # ข้อความ spam ที่ AI ยืนยันแล้ว ใช้หาความคิดเห็นที่คล้ายกันโดยไม่ต้องถาม AI ซ้ำ
+        self.similarity_index = SimilarityIndex(**config.get("similarity_index", {}))
+        
+        # cache ผลวิเคราะห์ของ AI (ใช้ร่วมกับ scanner เครื่องอื่นได้ผ่าน verdict cache server)
+        # import ตอนสร้าง detector ส่วน socket โหลดเมื่อตั้ง host และเชื่อมต่อจริงเท่านั้น
+        from verdict_cache import VerdictCacheClient
+        self.verdict_cache = VerdictCacheClient(**(config.get("verdict_cache") or {}))
+        
+        # รายละเอียดการตัดสินของความคิดเห็นล่าสุด (ใช้บันทึกลง ResultsStore)
+        self.last_result = None
+        self.last_llm_answer = None
+        # จำนวน request ที่ส่งไปยัง AI จริง (ใช้หักงบของ EscalationScheduler)
+        self.llm_requests = 0
         
         self.spam_db_file = "spam_patterns_db.json"
         self.load_spam_patterns()
         
     def load_spam_patterns(self):
-        """โหลด patterns จากฐานข้อมูล"""
+        """โหลด patterns จากฐานข้อมูล (ใช้ snapshot ที่ compile แล้วถ้ายังตรงกับไฟล์ JSON)"""
         try:
             if os.path.exists(self.spam_db_file):
-                with open(self.spam_db_file, 'r', encoding='utf-8') as f:
-                    self.spam_patterns = json.load(f)
+                self.spam_patterns, self.compiled_patterns = pattern_snapshot.load(self.spam_db_file)
             else:
                 self.spam_patterns = []
+                self.compiled_patterns = []
                 self.save_spam_patterns()
         except Exception as e:
-            print(f"ไม่สามารถโหลดฐานข้อมูลได้: {e}")
+            log.error("pattern_db_load_failed", f"ไม่สามารถโหลดฐานข้อมูลได้: {e}", error=str(e))
             self.spam_patterns = []
+            self.compiled_patterns = []
 
     def save_spam_patterns(self):
         """บันทึก patterns ลงฐานข้อมูล"""
         try:
             with open(self.spam_db_file, 'w', encoding='utf-8') as f:
                 json.dump(self.spam_patterns, f, ensure_ascii=False, indent=2)
+            self.compiled_patterns = pattern_snapshot.compile_patterns(self.spam_patterns)
+            pattern_snapshot.store(self.spam_db_file, self.spam_patterns, self.compiled_patterns)
         except Exception as e:
-            print(f"ไม่สามารถบันทึกฐานข้อมูลได้: {e}")
+            log.error("pattern_db_save_failed", f"ไม่สามารถบันทึกฐานข้อมูลได้: {e}", error=str(e))
 
     def add_new_pattern(self, text, pattern_type="gambling"):
         """เพิ่ม pattern ใหม่ลงฐานข้อมูล"""
@@ -56,138 +120,222 @@ class YouTubeSpamDetector:
             }
             self.spam_patterns.append(new_pattern)
             self.save_spam_patterns()
-            print(f"\n🔄 เพิ่ม pattern ใหม่: {text}")
+            log.info("pattern_added", f"\n🔄 เพิ่ม pattern ใหม่: {text}", pattern=text, type=pattern_type)
 
-    def analyze_with_llm(self, text):
-        """วิเคราะห์ข้อความด้วย LLM"""
+    def _learn_identifiers(self, text):
+        """นำ URL/domain/Line ID/@handle จาก spam ที่ยืนยันแล้วเข้า blocklist"""
+        added = self.identifier_blocklist.add(extract_identifiers(text, self.preprocess_text(text)))
+        if added:
+            log.info("blocklist_added", f"🔄 เพิ่มเข้า blocklist: {', '.join(sorted(added))}", identifiers=sorted(added))
+
+    def save_stores(self):
+        """บันทึกสิ่งที่เรียนรู้ระหว่างสแกน (เรียกครั้งเดียวหลังสแกนเสร็จ แทนการเขียนไฟล์ทุกครั้งที่เพิ่ม)"""
+        self.author_reputation.save()
+        self.identifier_blocklist.save()
+        self.similarity_index.save()
+
+    def _get_breaker(self, ai_config):
+        """ดึง circuit breaker ของ provider (สร้างใหม่ถ้ายังไม่มี)"""
+        name = ai_config["name"]
+        if name not in self.llm_breakers:
+            self.llm_breakers[name] = CircuitBreaker(
+                name,
+                probe_fn=lambda: self._probe_provider(ai_config),
+                failure_threshold=self.breaker_config.get("failure_threshold", 3),
+                reset_timeout=self.breaker_config.get("reset_timeout", 30)
+            )
+        return self.llm_breakers[name]
+
+    def _probe_provider(self, ai_config):
+        """ตรวจว่า provider กลับมาใช้งานได้หรือยัง (ไม่เสีย token)"""
+        import requests
+        parsed = urlparse(ai_config["url"])
+        if ai_config["name"] == "ollama":
+            probe_url = f"{parsed.scheme}://{parsed.netloc}/api/tags"
+        else:
+            probe_url = f"{parsed.scheme}://{parsed.netloc}/v1/models"
+        
+        headers = {}
+        if "api_key" in ai_config:
+            if ai_config["name"] == "grok":
+                headers["Authorization"] = ai_config["api_key"]
+            else:
+                headers["Authorization"] = f"Bearer {ai_config['api_key']}"
+        
         try:
-            prompt = f"""กรุณาวิเคราะห์ข้อความนี้ว่าเป็นการโฆษณาเว็บพนันหรือไม่:
+            response = cassette.http().get(probe_url, headers=headers, timeout=5)
+            return response.status_code < 500
+        except requests.exceptions.RequestException:
+            return False
 
-            ข้อความ: {text}
+    def get_stats(self):
+        """สถิติการทำงานของ detector"""
+        return {
+            "llm_breakers": {name: breaker.stats() for name, breaker in self.llm_breakers.items()},
+            "llm_providers": self.provider_pool.stats(),
+            "author_reputation": self.author_reputation.get_stats(),
+            "identifier_blocklist": self.identifier_blocklist.get_stats(),
+            "similarity_index": self.similarity_index.get_stats(),
+            "verdict_cache": self.verdict_cache.get_stats()
+        }
 
-            ตอบในรูปแบบนี้เท่านั้น:
-            คะแนน: [0-100] (ให้คะแนนความน่าจะเป็นโฆษณาเว็บพนัน)
-            ผลวิเคราะห์: [สแปม/ไม่ใช่สแปม/ไม่แน่ใจ]
-            เหตุผล: [อธิบายเหตุผลประกอบการวิเคราะห์]
+    def _build_llm_request(self, ai_config, prompt):
+        """สร้าง payload และ headers ตาม provider"""
+        # สร้าง payload ตาม provider
+        if ai_config["name"] == "ollama":
+            payload = {
+                "model": ai_config["model"],
+                "messages": [
+                    {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
+                    {"role": "user", "content": prompt}
+                ]
+            }
+        elif ai_config["name"] == "openai":
+            payload = {
+                "model": "gpt-3.5-turbo",
+                "messages": [
+                    {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 200
+            }
+        elif ai_config["name"] == "deepseek":
+            payload = {
+                "model": ai_config["model"],
+                "messages": [
+                    {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 200
+            }
+        elif ai_config["name"] == "grok":
+            payload = {
+                "model": ai_config["model"],
+                "messages": [
+                    {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 200
+            }
+        else:
+            # LM Studio และ providers อื่นๆ
+            payload = {
+                "messages": [
+                    {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 200
+            }
 
-            หมายเหตุ: กรุณาตอบเป็นภาษาไทยเท่านั้น ไม่ต้องใส่ข้อความอื่นนอกเหนือจากที่กำหนด
-            """
+        # Ollama stream เป็นค่าเริ่มต้น ต้องระบุให้ชัดทุก provider
+        payload["stream"] = self.llm_stream
 
-            # สร้าง payload ตาม provider
-            if self.ai_config["name"] == "ollama":
-                payload = {
-                    "model": self.ai_config["model"],
-                    "messages": [
-                        {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-            elif self.ai_config["name"] == "openai":
-                payload = {
-                    "model": "gpt-3.5-turbo",
-                    "messages": [
-                        {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
-            elif self.ai_config["name"] == "deepseek":
-                payload = {
-                    "model": self.ai_config["model"],
-                    "messages": [
-                        {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
-            elif self.ai_config["name"] == "grok":
-                payload = {
-                    "model": self.ai_config["model"],
-                    "messages": [
-                        {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200,
-                    "stream": False
-                }
+        # เพิ่ม headers ตาม provider
+        headers = {
+            "Content-Type": "application/json"
+        }
+        if "api_key" in ai_config:
+            if ai_config["name"] == "grok":
+                headers["Authorization"] = ai_config["api_key"]  # Grok ใช้ key โดยตรง
             else:
-                # LM Studio และ providers อื่นๆ
-                payload = {
-                    "messages": [
-                        {"role": "system", "content": "คุณเป็น AI ที่ช่วยวิเคราะห์ข้อความภาษาไทย ตอบเป็นภาษาไทยเท่านั้น"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
-
-            # เพิ่ม headers ตาม provider
-            headers = {
-                "Content-Type": "application/json"
-            }
-            if "api_key" in self.ai_config:
-                if self.ai_config["name"] == "grok":
-                    headers["Authorization"] = self.ai_config["api_key"]  # Grok ใช้ key โดยตรง
-                else:
-                    headers["Authorization"] = f"Bearer {self.ai_config['api_key']}"
+                headers["Authorization"] = f"Bearer {ai_config['api_key']}"
+
+        return payload, headers
+
+    def _request_llm_answer(self, ai_config, prompt):
+        """ส่ง prompt ไปยัง provider หนึ่งตัว คืนค่าคำตอบ หรือ None ถ้า error/คำตอบใช้ไม่ได้"""
+        import requests
+        # ถ้าวงจรเปิดอยู่ ไม่ต้องรอ socket ที่ตายแล้ว ข้ามไป provider ถัดไปหรือให้ is_spam ใช้ pattern score ตัดสิน
+        breaker = self._get_breaker(ai_config)
+        if not breaker.allow_request():
+            log.warning("llm_circuit_open", f"⚡ {ai_config['name'].upper()} ไม่พร้อมใช้งาน (circuit {breaker.state}) ข้ามการใช้ AI",
+                        provider=ai_config["name"], state=breaker.state)
+            metrics.inc("llm_fast_fail_total", labels={"provider": ai_config["name"]})
+            return None
 
-            # ส่ง request
-            try:
-                response = requests.post(self.llm_url, json=payload, headers=headers)
+        payload, headers = self._build_llm_request(ai_config, prompt)
+
+        # นับเมื่อสร้าง request ได้แล้วเท่านั้น (request ที่ล้มเหลวก่อนส่งไม่หักงบ)
+        metrics.inc("llm_calls_total", labels={"provider": ai_config["name"]})
+        self.llm_requests += 1
+
+        # ส่ง request
+        try:
+            if self.llm_stream:
+                # อ่านทีละส่วน ปิด connection ทันทีเมื่อได้คะแนนและผลวิเคราะห์
+                with cassette.http().post(ai_config["url"], json=payload, headers=headers,
+                                          timeout=self.llm_timeout, stream=True) as response:
+                    response.raise_for_status()
+                    full_answer, _ = read_streamed_answer(
+                        response.iter_lines(), ai_config["name"], need_reason=self.llm_need_reason
+                    )
+                full_answer = full_answer.strip()
+            else:
+                response = cassette.http().post(ai_config["url"], json=payload, headers=headers, timeout=self.llm_timeout)
                 response.raise_for_status()
                 
                 # แยกการอ่านผลลัพธ์ตาม provider
-                if self.ai_config["name"] == "ollama":
+                if ai_config["name"] == "ollama":
                     full_answer = response.json()['message']['content'].strip()
                 else:
                     full_answer = response.json()['choices'][0]['message']['content'].strip()
 
-            except requests.exceptions.RequestException as e:
-                print(f"❌ ไม่สามารถเชื่อมต่อกับ {self.ai_config['name'].upper()} ได้")
-                if hasattr(e.response, 'text'):
-                    print(f"เหตุผล: {e.response.text}")
-                if self.ai_config["name"] == "grok":
-                    print("โปรดตรวจสอบ API Key และ model name ที่ถูกต้องจาก Grok")
-                return None
+            breaker.record_success()
 
-            # ลบข้อความที่ไม่ต้องการออก
-            full_answer = re.sub(r'<\|im_start\|>|<\|im_end\|>|上下文|assistant|user', '', full_answer)
-            
-            # แยกส่วนประกอบของคำตอบ
-            lines = [line.strip() for line in full_answer.split('\n') if line.strip()]
-            ai_score = 0
-            ai_result = "ไม่แน่ใจ"
-            ai_reason = ""
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            metrics.inc("llm_errors_total", labels={"provider": ai_config["name"]})
+            log.warning("llm_request_failed", f"❌ ไม่สามารถเชื่อมต่อกับ {ai_config['name'].upper()} ได้",
+                        provider=ai_config["name"], error=str(e))
+            if hasattr(e.response, 'text'):
+                log.warning("llm_request_failed_detail", f"เหตุผล: {e.response.text}", provider=ai_config["name"])
+            if ai_config["name"] == "grok":
+                log.warning("llm_grok_hint", "โปรดตรวจสอบ API Key และ model name ที่ถูกต้องจาก Grok")
+            return None
+        except (ValueError, KeyError, IndexError):
+            breaker.record_failure()
+            metrics.inc("llm_errors_total", labels={"provider": ai_config["name"]})
+            log.warning("llm_bad_response", f"❌ รูปแบบคำตอบจาก {ai_config['name'].upper()} ไม่ถูกต้อง",
+                        provider=ai_config["name"])
+            return None
+
+        # คำตอบที่ไม่มีคะแนนถือว่าใช้ไม่ได้ ให้ provider อื่นตอบแทน
+        if "คะแนน" not in full_answer:
+            return None
+        return full_answer
+
+    def analyze_with_llm(self, text):
+        """วิเคราะห์ข้อความด้วย LLM (ใช้ผลจาก verdict cache ถ้าเคยวิเคราะห์ข้อความเดียวกันแล้ว)"""
+        self.last_llm_answer = None
+        try:
+            cache_key = self.verdict_cache.key(text)
+            answer = self.verdict_cache.get(cache_key)
+            metrics.inc("cache_lookups_total", labels={"cache": "verdict_cache", "result": "hit" if answer else "miss"})
+            if answer:
+                log.info("llm_cache_hit", "📦 ใช้ผลวิเคราะห์ของข้อความเดียวกันจาก cache", score=answer["score"])
+            else:
+                answer = self._ask_llm(text)
+                if answer is None:
+                    return None
+                self.verdict_cache.set(cache_key, answer)
             
-            for line in lines:
-                if line.startswith("คะแนน:"):
-                    try:
-                        ai_score = int(re.search(r'\d+', line).group())
-                    except:
-                        ai_score = 0
-                elif line.startswith("ผลวิเคราะห์:"):
-                    result_text = line.split(":", 1)[1].strip().lower()
-                    if "สแปม" in result_text:
-                        ai_result = "สแปม"
-                    elif "ไม่ใช่" in result_text:
-                        ai_result = "ไม่ใช่สแปม"
-                    else:
-                        ai_result = "ไม่แน่ใจ"
-                elif line.startswith("เหตุผล:"):
-                    ai_reason = line.split(":", 1)[1].strip()
+            ai_score, ai_result, ai_reason = answer["score"], answer["verdict"], answer.get("reason", "")
+            self.last_llm_answer = {"score": ai_score, "verdict": ai_result}
             
             # แสดงผลการวิเคราะห์
-            print(f"💡 คะแนนจาก AI: {ai_score}/100")
-            print(f"🤖 ผลวิเคราะห์: {ai_result}")
-            if ai_reason:
-                print(f"💬 เหตุผล: {ai_reason}")
+            log.info("llm_result", f"💡 คะแนนจาก AI: {ai_score}/100\n🤖 ผลวิเคราะห์: {ai_result}"
+                     + (f"\n💬 เหตุผล: {ai_reason}" if ai_reason else ""),
+                     score=ai_score, verdict=ai_result, reason=ai_reason or None)
             
-            # ถ้าเป็น spam ให้เพิ่มลงฐานข้อมูล
+            # ถ้าเป็น spam ให้เพิ่มลงดัชนีความคล้าย (แทนการเก็บข้อความเป็น regex)
             if ai_score >= 80 and len(text) > 10:
-                self.add_new_pattern(text)
+                if self.similarity_index.add(text):
+                    log.info("similarity_added", f"\n🔄 เพิ่มข้อความ spam ลงดัชนีความคล้าย: {text[:100]}", text=text[:100])
+                self._learn_identifiers(text)
                 return True
             elif ai_score > 50:
                 return True
@@ -197,66 +345,245 @@ class YouTubeSpamDetector:
                 return None if ai_result == "ไม่แน่ใจ" else (ai_result == "สแปม")
             
         except Exception as e:
-            print(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+            log.error("llm_error", f"❌ เกิดข้อผิดพลาด: {str(e)}", error=str(e))
+            return None
+
+    def prefetch_verdicts(self, texts):
+        """ดึงผลวิเคราะห์ของหลายข้อความจาก verdict cache server ในรอบเดียว (เก็บไว้ใน cache ในเครื่อง)"""
+        if self.verdict_cache.remote_available and texts:
+            self.verdict_cache.get_many([self.verdict_cache.key(text) for text in texts])
+
+    def has_cached_verdict(self, text):
+        """มีผลวิเคราะห์ของข้อความนี้ใน cache ในเครื่องแล้วหรือไม่ (ไม่ต้องใช้งบ AI)"""
+        return self.verdict_cache.local.peek(self.verdict_cache.key(text))
+
+    def _ask_llm(self, text):
+        """ส่งข้อความให้ LLM คืนค่า {"score", "verdict", "reason"} หรือ None ถ้าไม่ได้คำตอบ"""
+        prompt = f"""กรุณาวิเคราะห์ข้อความนี้ว่าเป็นการโฆษณาเว็บพนันหรือไม่:
+
+            ข้อความ: {text}
+
+            ตอบในรูปแบบนี้เท่านั้น:
+            คะแนน: [0-100] (ให้คะแนนความน่าจะเป็นโฆษณาเว็บพนัน)
+            ผลวิเคราะห์: [สแปม/ไม่ใช่สแปม/ไม่แน่ใจ]
+            เหตุผล: [อธิบายเหตุผลประกอบการวิเคราะห์]
+
+            หมายเหตุ: กรุณาตอบเป็นภาษาไทยเท่านั้น ไม่ต้องใส่ข้อความอื่นนอกเหนือจากที่กำหนด
+            """
+
+        # ส่งผ่าน provider pool (hedge เมื่อช้า, failover เมื่อ error)
+        full_answer, provider = self.provider_pool.execute(
+            lambda ai_config: self._request_llm_answer(ai_config, prompt)
+        )
+        if full_answer is None:
             return None
+        if self.ai_config and provider["name"] != self.ai_config["name"]:
+            log.info("llm_failover", f"🔀 ได้คำตอบจาก {provider['name'].upper()}", provider=provider["name"])
+
+        # ลบข้อความที่ไม่ต้องการออก
+        full_answer = re.sub(r'<\|im_start\|>|<\|im_end\|>|上下文|assistant|user', '', full_answer)
+        
+        # แยกส่วนประกอบของคำตอบ
+        lines = [line.strip() for line in full_answer.split('\n') if line.strip()]
+        ai_score = 0
+        ai_result = "ไม่แน่ใจ"
+        ai_reason = ""
+        
+        for line in lines:
+            if line.startswith("คะแนน:"):
+                try:
+                    ai_score = int(re.search(r'\d+', line).group())
+                except:
+                    ai_score = 0
+            elif line.startswith("ผลวิเคราะห์:"):
+                result_text = line.split(":", 1)[1].strip().lower()
+                if "สแปม" in result_text:
+                    ai_result = "สแปม"
+                elif "ไม่ใช่" in result_text:
+                    ai_result = "ไม่ใช่สแปม"
+                else:
+                    ai_result = "ไม่แน่ใจ"
+            elif line.startswith("เหตุผล:"):
+                ai_reason = line.split(":", 1)[1].strip()
+        
+        return {"score": ai_score, "verdict": ai_result, "reason": ai_reason}
+
+    def is_spam(self, comment, author_id=None, defer_llm=False):
+        """ตรวจสอบว่าข้อความเป็น spam หรือไม่
+
+        author_id: authorChannelId ของผู้เขียน (ถ้ามี) ใช้ตัดสินเร็วจากประวัติ
+        defer_llm: ไม่เรียก AI ทันที คืนค่า None และตั้ง decided_by เป็น "pending_llm"
+                   ให้ผู้เรียกตัดสินภายหลังด้วย resolve_escalation
+        """
+        with tracer.span("is_spam", author_id=author_id, length=len(comment)) as span:
+            spam = self._judge_comment(comment, author_id, defer_llm)
+            span.set(decided_by=self.last_result["decided_by"], spam=spam,
+                     pattern_score=self.last_result["pattern_score"])
+            return spam
 
-    def is_spam(self, comment):
-        """ตรวจสอบว่าข้อความเป็น spam หรือไม่"""
-        print(f"\n🔍 กำลังวิเคราะห์: {comment[:100]}...")
+    def _judge_comment(self, comment, author_id, defer_llm=False):
+        """ขั้นตอนตัดสินจริงของ is_spam"""
+        log.info("analyze", f"\n🔍 กำลังวิเคราะห์: {comment[:100]}...", author_id=author_id)
+        started = time.perf_counter()
+        result = self.last_result = {
+            "pattern_score": 0,
+            "matched_patterns": [],
+            "llm_score": None,
+            "llm_verdict": None,
+            "decided_by": None,
+            "pattern_ms": 0.0,
+            "llm_ms": 0.0,
+            "total_ms": 0.0
+        }
+        
+        # ผู้เขียนที่ AI ยืนยันว่า spam มาแล้วหลายครั้ง ตัดสินได้ทันที
+        # (นับเฉพาะผลจาก AI ผลจาก blocklist/ความคล้ายไม่นับ เพื่อไม่ให้ false positive ขยายผลต่อ)
+        reputation = self.author_reputation.lookup(author_id)
+        if author_id:
+            metrics.inc("cache_lookups_total", labels={"cache": "author_reputation", "result": "hit" if reputation else "miss"})
+        if reputation == "spam":
+            log.info("verdict", "🚫 ผู้เขียนเคยโพสต์ Spam ที่ยืนยันแล้ว ถือว่าเป็น Spam",
+                     spam=True, decided_by="author_reputation", author_id=author_id)
+            return self._finish_result(result, "author_reputation", True, started)
+        
+        # URL/domain/Line ID/@handle ที่อยู่ใน blocklist ตัดสินได้ทันทีโดยไม่ต้องใช้ regex หรือ AI
+        with metrics.timer("preprocess_seconds"), tracer.span("preprocess_text"):
+            cleaned_comment = self.preprocess_text(comment)
+        with tracer.span("identifier_blocklist"):
+            blocked = self.identifier_blocklist.match(extract_identifiers(comment, cleaned_comment))
+        metrics.inc("cache_lookups_total", labels={"cache": "identifier_blocklist", "result": "hit" if blocked else "miss"})
+        if blocked:
+            log.info("verdict", f"🚫 พบ {blocked} ใน blocklist ถือว่าเป็น Spam",
+                     spam=True, decided_by="blocklist", identifier=blocked)
+            return self._finish_result(result, "blocklist", True, started)
+        
+        # ความคิดเห็นที่คล้ายกับ spam ที่ AI ยืนยันแล้วเกิน threshold ตัดสินได้โดยไม่ต้องใช้ AI
+        with metrics.timer("similarity_seconds"), tracer.span("similarity_index") as similarity_span:
+            similarity, similar_text = self.similarity_index.query(comment)
+            similarity_span.set(similarity=round(similarity, 3), hit=similar_text is not None)
+        metrics.inc("cache_lookups_total", labels={"cache": "similarity_index", "result": "hit" if similar_text else "miss"})
+        if similar_text:
+            log.info("verdict", f"🚫 คล้ายกับ Spam ที่ยืนยันแล้ว ({similarity:.2f}) ถือว่าเป็น Spam",
+                     spam=True, decided_by="similarity", similarity=round(similarity, 3), similar_to=similar_text[:100])
+            return self._finish_result(result, "similarity", True, started)
         
         # เริ่มต้นด้วย score = 0
         pattern_score = 0
         matched_patterns = []
+        pattern_started = time.perf_counter()
         
-        # ตรวจสอบด้วย patterns spam
-        for pattern_obj in self.spam_patterns:
-            pattern = pattern_obj['pattern']
-            pattern_type = pattern_obj['type']
-            try:
-                if re.search(pattern, comment):
-                    if pattern_type == "gambling_site_name":
-                        pattern_score += 3
-                    elif pattern_type == "gambling_keywords":
-                        pattern_score += 2
-                    else:
-                        pattern_score += 1
+        # ตรวจสอบด้วย patterns spam (patterns ถูกเขียนใหม่ให้ตรงกับ skeleton ตอนโหลด)
+        with metrics.timer("pattern_db_seconds"), tracer.span("pattern_db", patterns=len(self.compiled_patterns)):
+            comment_skeleton = skeleton(comment)
+            for regex, pattern, weight in self.compiled_patterns:
+                if regex.search(comment_skeleton):
+                    pattern_score += weight
                     matched_patterns.append(pattern)
-            except Exception as e:
-                continue
         
         # ตรวจสอบ patterns พื้นฐาน
-        if self._check_basic_spam_patterns(comment):
+        with metrics.timer("basic_patterns_seconds"), tracer.span("basic_patterns"):
+            basic_match = self._check_basic_spam_patterns(comment, cleaned_comment)
+        if basic_match:
             pattern_score += 2
             matched_patterns.append("basic_spam_pattern")
         
+        result["pattern_score"] = pattern_score
+        result["matched_patterns"] = matched_patterns
+        result["pattern_ms"] = (time.perf_counter() - pattern_started) * 1000
+        
         # แสดงผลการตรวจสอบเบื้องต้น
         if matched_patterns:
-            print(f"⚠️ พบ patterns ที่ตรงกัน {len(matched_patterns)} รูปแบบ")
-            print(f"📊 Pattern Score: {pattern_score}")
+            log.info("patterns_matched", f"⚠️ พบ patterns ที่ตรงกัน {len(matched_patterns)} รูปแบบ\n📊 Pattern Score: {pattern_score}",
+                     count=len(matched_patterns), pattern_score=pattern_score)
         
         # ถ้าคะแนนต่ำ (0) และข้อความสั้น ถือว่าไม่ใช่ spam
         if pattern_score == 0 and len(comment.split()) < 20:
-            print("✅ ไม่พบรูปแบบที่น่าสงสัย")
-            return False
+            log.info("verdict", "✅ ไม่พบรูปแบบที่น่าสงสัย", spam=False, decided_by="no_pattern")
+            self.author_reputation.record(author_id, False)
+            return self._finish_result(result, "no_pattern", False, started)
+        
+        # ผู้เขียนที่ไม่เคย spam และ pattern score ต่ำ ไม่ต้องใช้ AI
+        if self.author_reputation.is_trusted(reputation, pattern_score, self.trusted_author_max_score):
+            log.info("verdict", "✅ ผู้เขียนไม่เคยโพสต์ Spam และ Pattern Score ต่ำ ถือว่าไม่ใช่ Spam",
+                     spam=False, decided_by="trusted_author", pattern_score=pattern_score)
+            return self._finish_result(result, "trusted_author", False, started)
         
         # ให้ AI ช่วยวิเคราะห์ทุกกรณีที่มี pattern score ตั้งแต่ 1 ขึ้นไป
         if pattern_score > 0:
-            print("🤖 ใช้ AI ตรวจสอบเพิ่มเติม...")
-            llm_result = self.analyze_with_llm(comment)
-            
-            if llm_result is True:
-                print("🚫 AI ยืนยันว่าเป็น Spam!")
-                return True
-            elif llm_result is False:
-                print("✅ AI ยืนยันว่าไม่ใช่ Spam")
-                return False
+            if defer_llm:
+                # เก็บไว้ให้ EscalationScheduler จัดลำดับตามงบของการสแกน
+                result["decided_by"] = "pending_llm"
+                result["total_ms"] = (time.perf_counter() - started) * 1000
+                return None
+            return self._escalate(comment, author_id, result, started)
+        
+        return self._finish_result(result, "no_pattern", False, started)
+    
+    def resolve_escalation(self, comment, author_id, result, use_llm):
+        """ตัดสินความคิดเห็นที่ is_spam(defer_llm=True) เลื่อนไว้
+
+        result: last_result ของความคิดเห็นนั้น (decided_by == "pending_llm")
+        use_llm: False เมื่องบ AI ของการสแกนหมด ใช้ pattern score ตัดสินแทน
+        """
+        self.last_result = result
+        started = time.perf_counter()
+        with tracer.span("resolve_escalation", use_llm=use_llm, pattern_score=result["pattern_score"]) as span:
+            # spam ที่ AI เพิ่งยืนยันระหว่างการสแกนอาจทำให้ข้อความนี้ตัดสินได้โดยไม่ต้องใช้งบ
+            similarity, similar_text = self.similarity_index.query(comment)
+            if similar_text:
+                log.info("verdict", f"🚫 คล้ายกับ Spam ที่ยืนยันแล้ว ({similarity:.2f}) ถือว่าเป็น Spam",
+                         spam=True, decided_by="similarity", similarity=round(similarity, 3), similar_to=similar_text[:100])
+                spam = self._finish_result(result, "similarity", True, started)
+            elif use_llm:
+                spam = self._escalate(comment, author_id, result, started)
             else:
-                # ถ้า AI ไม่แน่ใจ ให้ใช้ pattern score ตัดสิน
-                is_spam = pattern_score >= 2
-                print(f"❓ AI ไม่แน่ใจ {'🚫 ถือว่าเป็น Spam' if is_spam else '✅ ถือว่าไม่ใช่ Spam'} (ใช้ Pattern Score ตัดสิน)")
-                return is_spam
+                spam = result["pattern_score"] >= 2
+                log.info("verdict", f"💸 งบ AI หมด {'🚫 ถือว่าเป็น Spam' if spam else '✅ ถือว่าไม่ใช่ Spam'} (ใช้ Pattern Score ตัดสิน)",
+                         spam=spam, decided_by="budget_exhausted", pattern_score=result["pattern_score"])
+                spam = self._finish_result(result, "budget_exhausted", spam, started)
+            span.set(decided_by=result["decided_by"], spam=spam)
+            return spam
+    
+    def _escalate(self, comment, author_id, result, started):
+        """ส่งความคิดเห็นให้ AI ตัดสิน (ใช้ pattern score เมื่อ AI ไม่แน่ใจ)"""
+        pattern_score = result["pattern_score"]
+        log.info("llm_escalate", "🤖 ใช้ AI ตรวจสอบเพิ่มเติม...", pattern_score=pattern_score)
+        llm_started = time.perf_counter()
+        with tracer.span("analyze_with_llm", cat="llm") as llm_span:
+            llm_result = self.analyze_with_llm(comment)
+            llm_span.set(result=llm_result, answer=self.last_llm_answer)
+        result["llm_ms"] = (time.perf_counter() - llm_started) * 1000
+        metrics.observe("llm_seconds", result["llm_ms"] / 1000)
+        if self.last_llm_answer:
+            result["llm_score"] = self.last_llm_answer["score"]
+            result["llm_verdict"] = self.last_llm_answer["verdict"]
         
-        return False
+        if llm_result is True:
+            log.info("verdict", "🚫 AI ยืนยันว่าเป็น Spam!", spam=True, decided_by="llm")
+            self.author_reputation.record(author_id, True)
+            return self._finish_result(result, "llm", True, started)
+        elif llm_result is False:
+            log.info("verdict", "✅ AI ยืนยันว่าไม่ใช่ Spam", spam=False, decided_by="llm")
+            self.author_reputation.record(author_id, False)
+            return self._finish_result(result, "llm", False, started)
+        else:
+            # ถ้า AI ไม่แน่ใจ ให้ใช้ pattern score ตัดสิน
+            is_spam = pattern_score >= 2
+            log.info("verdict", f"❓ AI ไม่แน่ใจ {'🚫 ถือว่าเป็น Spam' if is_spam else '✅ ถือว่าไม่ใช่ Spam'} (ใช้ Pattern Score ตัดสิน)",
+                     spam=is_spam, decided_by="pattern_fallback", pattern_score=pattern_score)
+            return self._finish_result(result, "pattern_fallback", is_spam, started)
+    
+    def _finish_result(self, result, decided_by, is_spam, started):
+        """บันทึกผลการตัดสินลง last_result แล้วคืนค่าผล
+
+        total_ms สะสมเวลาจากทุกช่วง (ความคิดเห็นที่เลื่อนไปให้ AI ตัดสินทีหลังมีสองช่วง)
+        """
+        result["decided_by"] = decided_by
+        result["is_spam"] = is_spam
+        result["total_ms"] += (time.perf_counter() - started) * 1000
+        metrics.inc("verdicts_total", labels={"decided_by": decided_by, "spam": str(is_spam).lower()})
+        metrics.observe("is_spam_seconds", result["total_ms"] / 1000)
+        return is_spam
     
     def preprocess_text(self, text):
         """ทำความสะอาดข้อความและแปลงอักขระพิเศษ"""
@@ -296,10 +623,11 @@ class YouTubeSpamDetector:
         text = text.lower().strip()
         return text
 
-    def _check_basic_spam_patterns(self, comment):
+    def _check_basic_spam_patterns(self, comment, cleaned_comment=None):
         """ตรวจสอบรูปแบบพื้นฐานของ spam"""
-        # ทำความสะอาดข้อความก่อน
-        cleaned_comment = self.preprocess_text(comment)
+        # ทำความสะอาดข้อความก่อน (ถ้ายังไม่ได้ทำ)
+        if cleaned_comment is None:
+            cleaned_comment = self.preprocess_text(comment)
         
         patterns = [
             # รูปแบบ ID/เบอร์ติดต่อ
@@ -328,7 +656,7 @@ class YouTubeSpamDetector:
     def delete_comment(self, comment_id):
         """ลบความคิดเห็น"""
         if not self.api_key or self.test_mode:
-            print("❌ ไม่สามารถลบความคิดเห็นได้ในโหมดทดสอบ")
+            log.warning("moderation_unavailable", "❌ ไม่สามารถลบความคิดเห็นได้ในโหมดทดสอบ", action="delete")
             return False
         
         try:
@@ -338,20 +666,25 @@ class YouTubeSpamDetector:
                 'key': self.api_key
             }
             
-            response = requests.delete(url, params=params)
-            response.raise_for_status()
+            metrics.inc("youtube_quota_units_total", 50, labels={"method": "comments.delete"})
+            with tracer.span("comments.delete", cat="moderation", comment_id=comment_id):
+                response = cassette.http().delete(url, params=params)
+                response.raise_for_status()
             
-            print(f"✅ ลบความคิดเห็น {comment_id} สำเร็จ")
+            log.info("moderation", f"✅ ลบความคิดเห็น {comment_id} สำเร็จ", action="delete", comment_id=comment_id, ok=True)
+            metrics.inc("moderation_actions_total", labels={"action": "delete", "result": "ok"})
             return True
         
         except Exception as e:
-            print(f"❌ ไม่สามารถลบความคิดเห็นได้: {str(e)}")
+            log.error("moderation", f"❌ ไม่สามารถลบความคิดเห็นได้: {str(e)}",
+                      action="delete", comment_id=comment_id, ok=False, error=str(e))
+            metrics.inc("moderation_actions_total", labels={"action": "delete", "result": "error"})
             return False
 
     def mark_as_spam(self, comment_id):
         """มาร์คความคิดเห็นเป็น spam"""
         if not self.api_key or self.test_mode:
-            print("❌ ไม่สามารถมาร์ค spam ได้ในโหมดทดสอบ")
+            log.warning("moderation_unavailable", "❌ ไม่สามารถมาร์ค spam ได้ในโหมดทดสอบ", action="mark_as_spam")
             return False
         
         try:
@@ -361,12 +694,18 @@ class YouTubeSpamDetector:
                 'key': self.api_key
             }
             
-            response = requests.post(url, params=params)
-            response.raise_for_status()
+            metrics.inc("youtube_quota_units_total", 50, labels={"method": "comments.markAsSpam"})
+            with tracer.span("comments.markAsSpam", cat="moderation", comment_id=comment_id):
+                response = cassette.http().post(url, params=params)
+                response.raise_for_status()
             
-            print(f"✅ มาร์คความคิดเห็น {comment_id} เป็น spam สำเร็จ")
+            log.info("moderation", f"✅ มาร์คความคิดเห็น {comment_id} เป็น spam สำเร็จ",
+                     action="mark_as_spam", comment_id=comment_id, ok=True)
+            metrics.inc("moderation_actions_total", labels={"action": "mark_as_spam", "result": "ok"})
             return True
         
         except Exception as e:
-            print(f"❌ ไม่สามารถมาร์ค spam ได้: {str(e)}")
+            log.error("moderation", f"❌ ไม่สามารถมาร์ค spam ได้: {str(e)}",
+                      action="mark_as_spam", comment_id=comment_id, ok=False, error=str(e))
+            metrics.inc("moderation_actions_total", labels={"action": "mark_as_spam", "result": "error"})
             return False 
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# โมดูลของโปรเจกต์อยู่ที่โฟลเดอร์บนสุด (ไม่ได้ติดตั้งเป็น package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+import os
+import re
+import tempfile
+import unittest
+
+from blocklist import IdentifierBlocklist, extract_identifiers
+
+
+def identifiers(text):
+    # เหมือน preprocess_text ในส่วนที่มีผลกับ blocklist
+    return extract_identifiers(text, re.sub(r'[^\w\s@._]', '', text).lower().strip())
+
+
+class ExtractIdentifiersTest(unittest.TestCase):
+    def test_benign_line_phrases(self):
+        for text in ["สล็อตฝากถอนออโต้ line now ด่วน", "line for the win", "on line today",
+                     "I'm in line now waiting for the premiere", "good lineage here", "online game",
+                     "line: the best", "thanks @someone great video", "Mr.Smith said hello.world"]:
+            with self.subTest(text=text):
+                self.assertEqual(identifiers(text), set())
+
+    def test_line_ids(self):
+        self.assertEqual(identifiers("line @abc123"), {"line:abc123", "handle:abc123"})
+        self.assertEqual(identifiers("line: shopx"), {"line:shopx"})
+        self.assertEqual(identifiers("line id shopx"), {"line:shopx"})
+        self.assertEqual(identifiers("ไลน์ไอดี: slot888"), {"line:slot888"})
+        self.assertEqual(identifiers("ไลน์ slot888"), {"line:slot888"})
+
+    def test_urls(self):
+        self.assertEqual(identifiers("เข้าเว็บ https://www.slot-x.com/reg"), {"domain:slot-x.com", "url:slot-x.com/reg"})
+        self.assertEqual(identifiers("https://bit.ly/3xyz"), {"url:bit.ly/3xyz"})
+        self.assertEqual(identifiers("ติดต่อ abc@gmail.com"), set())
+
+
+class LearnedLineIdTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = lambda name: os.path.join(self.tmp.name, name)
+        from spam_detector import YouTubeSpamDetector
+        self.detector = YouTubeSpamDetector({
+            "author_reputation": {"db_file": path("author_reputation.json")},
+            "identifier_blocklist": {"db_file": path("identifier_blocklist.json")},
+            "similarity_index": {"db_file": path("spam_similarity.json")}
+        }, test_mode=True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_spam_with_line_now_does_not_block_benign_comment(self):
+        self.detector._learn_identifiers("สล็อตเว็บตรง ฝากถอนออโต้ line now ด่วน แอด @slot99")
+        self.assertIn("handle:slot99", self.detector.identifier_blocklist.entries)
+        self.detector.is_spam("I'm in line now waiting for the premiere")
+        self.assertNotEqual(self.detector.last_result["decided_by"], "blocklist")
+
+    def test_store_saved_once(self):
+        blocklist = IdentifierBlocklist(db_file=os.path.join(self.tmp.name, "bl.json"))
+        blocklist.add({"domain:scam.net"})
+        self.assertFalse(os.path.exists(blocklist.db_file))
+        blocklist.save()
+        self.assertEqual(list(IdentifierBlocklist(db_file=blocklist.db_file).entries), ["domain:scam.net"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from results_store import ResultsStore
+
+COMMENT = {'id': 'c1', 'text': 'สล็อตเว็บตรง', 'author': '@promo', 'author_channel_id': 'UCpromo',
+           'channel_id': 'UCchannel', 'published_at': '2025-01-01T00:00:00Z'}
+
+
+def result(is_spam, decided_by):
+    return {"pattern_score": 3, "matched_patterns": ["x"], "is_spam": is_spam, "decided_by": decided_by,
+            "pattern_ms": 0.1, "llm_ms": 0.0, "total_ms": 0.2}
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.tmp.name, "scan_results.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_rescan_keeps_action(self):
+        self.store.add(COMMENT, "v1", result(True, "llm"))
+        self.store.record_actions(["c1"], "deleted")
+
+        self.store.add(COMMENT, "v1", result(True, "blocklist"))
+        self.store.flush()
+
+        row = self.store.conn.execute("SELECT action, decided_by FROM verdicts WHERE comment_id = 'c1'").fetchone()
+        self.assertEqual(row, ("deleted", "blocklist"))
+        summary = self.store.summary(video_id="v1")
+        self.assertEqual((summary["comments"], summary["spam"], summary["actions"]), (1, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from scraper import FixtureTransport, ScrapeEngine, find_comment_section_token, extract_initial_data
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scraper")
+URL = "https://www.youtube.com/watch?v=fixture"
+
+
+class RecordingFixtureTransport(FixtureTransport):
+    """FixtureTransport ที่จำ continuation token ที่ถูกขอ"""
+
+    def __init__(self, fixture_dir):
+        super().__init__(fixture_dir)
+        self.tokens = []
+
+    def post_json(self, url, payload):
+        self.tokens.append(payload["continuation"])
+        return super().post_json(url, payload)
+
+
+class ScrapeEngineFixtureTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = RecordingFixtureTransport(FIXTURE_DIR)
+        self.comments = ScrapeEngine(self.transport).scrape(URL)
+        self.by_id = {comment['id']: comment for comment in self.comments}
+
+    def test_initial_page_comment_renderer(self):
+        comment = self.by_id["c-renderer-1"]
+        self.assertEqual(comment['text'], "คลิปนี้ดีมาก ขอบคุณครับ")  # รวมทุก run
+        self.assertEqual(comment['author_channel_id'], "UCviewer1")
+        self.assertEqual(comment['published_at'], "2 วันที่แล้ว")
+
+    def test_continuation_comment_view_model(self):
+        comment = self.by_id["c-vm-1"]
+        self.assertEqual(comment['text'], "สล็อตเว็บตรง ฝากถอนไม่มีขั้นต่ำ แอดไลน์ @slot99")
+        self.assertEqual(comment['author'], "@promo")
+        self.assertEqual(comment['author_channel_id'], "UCpromo")
+        self.assertEqual(self.by_id["c-vm-2"]['text'], "รอดูตอนต่อไปครับ")
+
+    def test_replies_comment_renderer(self):
+        self.assertEqual(self.by_id["c-reply-1"]['text'], "เห็นด้วยครับ")
+
+    def test_follows_each_token_once_and_drops_duplicates(self):
+        self.assertEqual(sorted(self.transport.tokens), ["TOKEN_REPLIES", "TOKEN_SECTION"])
+        self.assertEqual(len(self.comments), 4)
+        self.assertEqual(self.comments[0]['id'], "c-renderer-1")
+
+    def test_max_comments(self):
+        comments = ScrapeEngine(FixtureTransport(FIXTURE_DIR), max_comments=2).scrape(URL)
+        self.assertEqual(len(comments), 2)
+
+    def test_section_token(self):
+        with open(os.path.join(FIXTURE_DIR, "watch.html"), 'r', encoding='utf-8') as f:
+            data = extract_initial_data(f.read())
+        self.assertEqual(find_comment_section_token(data), "TOKEN_SECTION")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from verdict_cache import CacheServer, LRUCache, VerdictCacheClient, verdict_key
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_expired_entry(self):
+        cache = LRUCache(ttl=-1)
+        cache.set("a", 1)
+        self.assertFalse(cache.peek("a"))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats["expired"], 1)
+
+
+class CacheServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = CacheServer("127.0.0.1", 0)
+        self.host, self.port = self.server.start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        if self.server is not None:
+            self.server.shutdown()
+
+    def client(self, **kwargs):
+        client = VerdictCacheClient(host=self.host, port=self.port, **kwargs)
+        self.clients.append(client)
+        return client
+
+    def test_verdict_shared_between_clients(self):
+        answer = {"score": 95, "verdict": "สแปม", "reason": ""}
+        self.client().set(verdict_key("สล็อตเว็บตรง"), answer)
+
+        other = self.client()
+        self.assertEqual(other.get(verdict_key("สล็อตเว็บตรง")), answer)
+        self.assertEqual(other.stats["remote_hits"], 1)
+        # ครั้งถัดไปได้จาก cache ในเครื่อง
+        self.assertTrue(other.local.peek(verdict_key("สล็อตเว็บตรง")))
+        self.assertEqual(self.server.cache.get_stats()["entries"], 1)
+
+    def test_get_many_batches(self):
+        writer = self.client()
+        for i in range(7):
+            writer.set(f"k{i}", {"score": i})
+
+        reader = self.client(batch_size=3)
+        found = reader.get_many([f"k{i}" for i in range(7)] + ["missing"])
+        self.assertEqual(sorted(found), [f"k{i}" for i in range(7)])
+        self.assertEqual(reader.stats["remote_hits"], 7)
+        self.assertEqual(reader.stats["remote_errors"], 0)
+
+    def test_falls_back_to_local_cache_when_server_is_down(self):
+        client = self.client(retry_after=60)
+        client.set("a", {"score": 1})
+        self.server.shutdown()
+        self.server = None
+        client.close()
+
+        self.assertIsNone(client.get("b"))
+        self.assertEqual(client.stats["remote_errors"], 1)
+        self.assertFalse(client.remote_available)
+        self.assertEqual(client.get("a"), {"score": 1})
+        # ไม่ลองเชื่อมต่อใหม่จนกว่าจะครบ retry_after
+        client.get("c")
+        self.assertEqual(client.stats["remote_errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
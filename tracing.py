@@ -0,0 +1,132 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+
+class _NullSpan:
+    """span ที่ไม่ทำอะไร ใช้เมื่อปิด tracing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """เพิ่มข้อมูลประกอบ span (แสดงใน trace viewer)"""
+        self.args.update(args)
+
+    def __enter__(self):
+        local = self.tracer._local
+        if getattr(local, "depth", 0) == 0:
+            # span แรกของ thread คือ root ตัดสินใจ sampling ที่นี่
+            local.buffer = []
+            local.sampled = random.random() < self.tracer.sample_rate
+        local.depth = getattr(local, "depth", 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        local = self.tracer._local
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        local.buffer.append({
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": round((self.start - self.tracer.origin) * 1e6, 1),
+            "dur": round((end - self.start) * 1e6, 1),
+            "pid": self.tracer.pid,
+            "tid": threading.get_ident(),
+            "args": self.args
+        })
+        local.depth -= 1
+        if local.depth == 0:
+            slow = (end - self.start) * 1000 >= self.tracer.slow_threshold_ms
+            if local.sampled or slow:
+                self.tracer._keep(local.buffer)
+            local.buffer = []
+        return False
+
+
+class Tracer:
+    """เก็บ span ของแต่ละขั้นตอนแล้วส่งออกเป็น Chrome trace-event JSON
+
+    - sampling ตัดสินที่ root span (เช่น is_spam หนึ่งครั้ง) span ลูกตามผลของ root
+    - root ที่ช้ากว่า slow_threshold_ms ถูกเก็บเสมอแม้ไม่ถูก sample
+    """
+
+    def __init__(self, enabled=False, sample_rate=1.0, slow_threshold_ms=5000, max_events=200000):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def span(self, name, cat="scan", **args):
+        """context manager สร้าง span"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _keep(self, events):
+        with self._lock:
+            room = self.max_events - len(self.events)
+            if room < len(events):
+                self.dropped += len(events) - max(room, 0)
+                events = events[:max(room, 0)]
+            self.events.extend(events)
+
+    def export(self, path):
+        """บันทึก trace เป็นไฟล์ JSON (เปิดได้ใน chrome://tracing หรือ Perfetto)"""
+        with self._lock:
+            events = list(self.events)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"sample_rate": self.sample_rate, "dropped_events": self.dropped}
+                }, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"ไม่สามารถบันทึก trace ได้: {e}")
+
+
+# tracer กลางที่ทุกโมดูลใช้ร่วมกัน
+tracer = Tracer()
+
+def configure(settings):
+    """เปิดใช้ tracing ตามการตั้งค่า
+
+    settings: {"enabled": bool, "sample_rate": 0-1, "slow_threshold_ms": int, "output": str}
+    """
+    if not settings or not settings.get("enabled"):
+        return tracer
+    tracer.enabled = True
+    tracer.sample_rate = settings.get("sample_rate", 1.0)
+    tracer.slow_threshold_ms = settings.get("slow_threshold_ms", 5000)
+    tracer.max_events = settings.get("max_events", 200000)
+    atexit.register(tracer.export, settings.get("output", "scan_trace.json"))
+    return tracer
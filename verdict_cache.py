@@ -0,0 +1,248 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from scan_log import get_logger
+from similarity_index import normalize
+
+log = get_logger("verdict_cache")
+
+def verdict_key(text):
+    """key ของข้อความ: hash ของข้อความที่ normalize แล้ว (spam ที่ copy-paste มาได้ key เดียวกัน)"""
+    return "llm:" + hashlib.sha1(normalize(text).encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """cache แบบ LRU พร้อมอายุ (TTL) ใช้ได้หลาย thread"""
+
+    def __init__(self, max_entries=100000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (หมดอายุเมื่อ, value)
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self.entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def peek(self, key):
+        """ตรวจว่ามี key ที่ยังไม่หมดอายุหรือไม่ โดยไม่นับสถิติและไม่เปลี่ยนลำดับ LRU"""
+        with self._lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry[0] >= time.time()
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self.entries[key] = (time.time() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            self.stats["sets"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_stats(self):
+        return dict(self.stats, entries=len(self.entries))
+
+
+class CacheServer:
+    """cache server ขนาดเล็กให้ scanner หลายเครื่องใช้ผลตัดสินร่วมกัน
+
+    โปรโตคอล: JSON หนึ่งบรรทัดต่อคำขอ ตอบกลับหนึ่งบรรทัดตามลำดับ (ส่งหลายคำขอติดกันได้โดยไม่ต้องรอ)
+      {"op": "mget", "keys": [...]}            -> {"values": [...]}
+      {"op": "mset", "items": [[k, v], ...]}   -> {"ok": จำนวน}
+      {"op": "stats"}                          -> สถิติของ cache
+    """
+
+    def __init__(self, host="127.0.0.1", port=9470, max_entries=100000, ttl=86400):
+        import socketserver
+        self.cache = LRUCache(max_entries, ttl)
+        cache = self.cache
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                        op = request.get("op")
+                        if op == "mget":
+                            reply = {"values": [cache.get(key) for key in request.get("keys", [])]}
+                        elif op == "mset":
+                            for key, value in request.get("items", []):
+                                cache.set(key, value, request.get("ttl"))
+                            reply = {"ok": len(request.get("items", []))}
+                        elif op == "stats":
+                            reply = cache.get_stats()
+                        else:
+                            reply = {"error": f"unknown op: {op}"}
+                    except (ValueError, TypeError, AttributeError) as e:
+                        reply = {"error": str(e)}
+                    self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b"\n")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        """เปิด server ใน thread แยก คืนค่า (host, port)"""
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self.address
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class VerdictCacheClient:
+    """cache ผลตัดสินของ AI: ตรวจ cache ในเครื่องก่อน แล้วจึงถาม cache server (ถ้าตั้งค่าไว้)
+
+    ถ้า server ติดต่อไม่ได้ ใช้ cache ในเครื่องอย่างเดียวและลองเชื่อมต่อใหม่ทุก retry_after วินาที
+    """
+
+    def __init__(self, host=None, port=9470, ttl=86400, local_max_entries=10000,
+                 timeout=0.5, retry_after=30, batch_size=500):
+        """
+        host: ที่อยู่ของ cache server (None = ใช้ cache ในเครื่องอย่างเดียว)
+        ttl: อายุของผลตัดสิน (วินาที)
+        local_max_entries: จำนวนผลตัดสินสูงสุดใน cache ในเครื่อง
+        timeout: วินาทีที่รอ server ต่อครั้ง
+        retry_after: วินาทีก่อนลองเชื่อมต่อ server ใหม่หลังล้มเหลว
+        batch_size: จำนวน key ต่อคำขอ mget หนึ่งครั้ง
+        """
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.batch_size = batch_size
+        self.local = LRUCache(local_max_entries, ttl)
+        self.stats = {"remote_hits": 0, "remote_errors": 0}
+        self._sock = None
+        self._file = None
+        self._down_until = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remote_available(self):
+        return bool(self.host) and time.time() >= self._down_until
+
+    def _connect(self):
+        if self._sock is None:
+            import socket
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._file = self._sock.makefile('rwb')
+
+    def _close(self):
+        for handle in (self._file, self._sock):
+            try:
+                if handle is not None:
+                    handle.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._file = None
+
+    def _pipeline(self, requests):
+        """ส่งคำขอทั้งหมดติดกันแล้วอ่านคำตอบตามลำดับ คืนค่า None ถ้า server ใช้ไม่ได้"""
+        if not requests or not self.remote_available:
+            return None
+        with self._lock:
+            try:
+                self._connect()
+                self._file.write(b"".join(json.dumps(r, ensure_ascii=False).encode('utf-8') + b"\n" for r in requests))
+                self._file.flush()
+                replies = []
+                for _ in requests:
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("server ปิดการเชื่อมต่อ")
+                    replies.append(json.loads(line))
+                return replies
+            except (OSError, ValueError) as e:
+                self._close()
+                self._down_until = time.time() + self.retry_after
+                self.stats["remote_errors"] += 1
+                log.warning("verdict_cache_unavailable", f"⚠️ ติดต่อ verdict cache server ไม่ได้ ({e}) ใช้ cache ในเครื่องแทน",
+                            host=self.host, port=self.port, error=str(e), retry_after=self.retry_after)
+                return None
+
+    def get_many(self, keys):
+        """คืนค่า dict ของ key ที่พบ (ถามเฉพาะ key ที่ไม่มีในเครื่อง รวมเป็นคำขอเดียวต่อ batch_size key)"""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        replies = self._pipeline([{"op": "mget", "keys": batch} for batch in batches])
+        for batch, reply in zip(batches, replies or []):
+            for key, value in zip(batch, reply.get("values", [])):
+                if value is not None:
+                    found[key] = value
+                    self.local.set(key, value)
+                    self.stats["remote_hits"] += 1
+        return found
+
+    def key(self, text):
+        return verdict_key(text)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self._pipeline([{"op": "mset", "items": [[key, value]], "ttl": self.ttl}])
+
+    def get_stats(self):
+        return dict(self.stats, local=self.local.get_stats(), remote=self.host and f"{self.host}:{self.port}",
+                    remote_available=self.remote_available)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="verdict cache server สำหรับ scanner หลายเครื่อง")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9470)
+    parser.add_argument("--max-entries", type=int, default=100000)
+    parser.add_argument("--ttl", type=int, default=86400)
+    args = parser.parse_args()
+
+    server = CacheServer(args.host, args.port, args.max_entries, args.ttl)
+    print(f"🗄️ Verdict cache server: {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()